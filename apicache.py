@@ -0,0 +1,108 @@
+# Spotify API response cache
+# Persistent key-value store (SQLite) for search / top-tracks responses with TTLs,
+# size-bounded LRU eviction and an offline mode that never touches the network
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = ".apicache.sqlite3"
+MAX_BYTES = 64 * 1024 * 1024
+
+# How long responses stay fresh, by kind of lookup
+TTL = {
+    "search": 30 * 24 * 3600,        # artist/track ids basically never change
+    "top-tracks": 7 * 24 * 3600,
+    "default": 24 * 3600,
+}
+
+
+class OfflineMiss(KeyError):
+    """Offline mode and the response isn't cached."""
+
+
+class ApiCache:
+    """SQLite-backed response cache.
+
+    Entries past their TTL count as misses, except in offline mode, where a
+    stale answer is better than none. Once the stored responses exceed
+    max_bytes the least recently used ones are evicted.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES, offline=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+        self.hits = self.misses = 0
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def key(path, params=None):
+        """Cache key for an API path and its query parameters."""
+        return path + "?" + json.dumps(sorted((params or {}).items()), ensure_ascii=False)
+
+    def get(self, key):
+        """Cached value or None (raises OfflineMiss instead of None in offline mode)."""
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and (self.offline or row[1] > now):
+                self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                self.db.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            self.misses += 1
+        if self.offline:
+            raise OfflineMiss(key)
+        return None
+
+    def put(self, key, value, ttl=TTL["default"]):
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                            (key, data, len(data), now + ttl, now))
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if total - evicted <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            evicted += size
+
+    def purge_expired(self):
+        """Delete every expired entry; returns how many were removed."""
+        with self.lock:
+            removed = self.db.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),)).rowcount
+            self.db.commit()
+        return removed
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses,
+                "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0}
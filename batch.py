@@ -0,0 +1,119 @@
+# Batch recommendations
+# Scores many users' streaming histories against the same catalog in a process pool and
+# writes every user's top k playlist for every mood to an output directory
+#   python batch.py users/ --out recommendations/ [--k 10] [--workers 8]
+# (users/ holds one streaminghistory folder per user)
+
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from canonical import Canonical
+from catalog import CACHE_DIR, cached_manifest, catalog_version, load_columns
+from history import load_history_keys
+from moodscore import mood_targets, score_matrix, target_matrix
+from ranking import top_k_moods
+
+
+class SharedCatalog:
+    """Read-only catalog state for one worker process.
+
+    Rows are the canonical songs (see canonical.py), the ones final.py scores.
+    Their feature matrix is canonical/features.npy opened memory-mapped, so
+    every worker reads the same pages from the OS page cache instead of
+    receiving a pickled copy. Only the names and genres needed for output are
+    loaded per worker, once, not per user.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, targets=mood_targets):
+        manifest = cached_manifest(cache_dir=cache_dir)
+        self.songs = Canonical(cache_dir)
+        strings = load_columns(["track_name", "artists"], cache_dir)
+        self.version = catalog_version(cache_dir)
+        self.features = self.songs.features()
+        self.fields = {name: values[self.songs.first_row] for name, values in strings.items()}
+        self.fields["genres"] = pd.Series(self.songs.genres, dtype=object).str.replace(";", ", ").to_numpy()
+        self.moods, self.T, self.W = target_matrix(targets, manifest["features"])
+
+    def recommend(self, keys, k=10):
+        """{mood: [song dicts]} for one user's history keys (same songs as final.py per mood)."""
+        listened = self.songs.lookup(keys)
+        rows = np.unique(listened[listened >= 0])   # song ids, in catalog order like final.py's rows
+        scores = score_matrix(self.features[rows], self.T, self.W)
+        playlists = {}
+        for j, (mood, positions) in enumerate(top_k_moods(scores, self.moods, k).items()):
+            picked = rows[positions]
+            playlists[mood] = [
+                {"track_name": name, "artists": artists, "genre": genre, "mood_score": round(score, 6)}
+                for name, artists, genre, score in zip(self.fields["track_name"][picked].tolist(),
+                                                       self.fields["artists"][picked].tolist(),
+                                                       self.fields["genres"][picked].tolist(),
+                                                       scores[positions, j].tolist())
+            ]
+        return len(rows), playlists
+
+
+_catalog = None   # this worker's SharedCatalog
+
+
+def _init_worker(cache_dir):
+    global _catalog
+    _catalog = SharedCatalog(cache_dir)
+
+
+def _run_user(task):
+    """Recommend for one user folder and write <out_dir>/<user>.json; returns a summary row."""
+    user, folder, out_dir, k = task
+    start = time.perf_counter()
+    songs, playlists = _catalog.recommend(load_history_keys(folder), k)
+    path = os.path.join(out_dir, user + ".json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"user": user, "catalog_version": _catalog.version, "songs": songs, "k": k,
+                   "moods": playlists}, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+    return user, songs, time.perf_counter() - start
+
+
+def user_folders(root):
+    """{user: history folder} for every subfolder of root that holds JSON files."""
+    users = {}
+    for name in sorted(os.listdir(root)):
+        folder = os.path.join(root, name)
+        if os.path.isdir(folder) and any(f.endswith(".json") for f in os.listdir(folder)):
+            users[name] = folder
+    return users
+
+
+def run_batch(users, out_dir, k=10, workers=None, cache_dir=CACHE_DIR):
+    """Write recommendations for {user: folder} using a pool of worker processes.
+
+    Users are handed out one at a time, so a slow (large) history doesn't hold
+    up a whole shard. Returns a list of (user, songs, seconds).
+    """
+    Canonical(cache_dir)   # build/refresh the catalog cache and its songs once, before the workers map them
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(user, folder, out_dir, k) for user, folder in users.items()]
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    with Pool(workers, initializer=_init_worker, initargs=(cache_dir,)) as pool:
+        return list(pool.imap_unordered(_run_user, tasks))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write top k playlists for every mood for many users")
+    parser.add_argument("users", help="folder with one streaming history folder per user")
+    parser.add_argument("--out", default="./recommendations", help="output folder (one JSON file per user)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_batch(user_folders(args.users), args.out, args.k, args.workers)
+    elapsed = time.perf_counter() - start
+    busy = sum(seconds for _, _, seconds in results)
+    print(f"{len(results)} users in {elapsed:.2f}s ({len(results) / elapsed:.1f} users/s, "
+          f"{busy:.2f}s of per-user work) -> {args.out}")
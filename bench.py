@@ -0,0 +1,261 @@
+# Benchmark suite
+# Generates synthetic Kaggle-shaped catalogs and StreamingHistory exports, times every
+# stage of the final.py flow on them and compares the timings with a saved baseline
+#   python bench.py --rows 10k 100k 1M --plays 50k --save     record a baseline
+#   python bench.py --rows 10k 100k 1M --plays 50k            compare (exit 1 on a regression)
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+
+import numpy as np
+
+import stages
+from canonical import build_canonical, canonical_catalog
+from catalog import build_cache
+from final import listened_songs, recommend_mood
+from playlog import PlayLog
+
+BENCH_DIR = ".bench"
+THRESHOLD = 0.25       # a stage regressed if it got this much slower than the baseline...
+MIN_SECONDS = 0.010    # ...and by at least this much (timer noise on tiny stages)
+DUPLICATE_SHARE = 0.1  # share of catalog rows repeating an earlier song under another genre, like the Kaggle data
+FEATURE_SHARE = 0.05   # share of songs with a second artist ("Artist 1;Artist 2")
+SKIP_SHARE = 0.2       # share of plays shorter than 30 s
+PLAYS_PER_FILE = 10_000
+GENRES = ["acoustic", "alt-rock", "ambient", "blues", "classical", "country", "dance", "disco", "edm", "folk",
+          "funk", "hip-hop", "indie", "jazz", "k-pop", "latin", "metal", "pop", "punk", "r-n-b", "reggae",
+          "rock", "soul", "techno"]
+
+
+def parse_count(text):
+    """10000, 10k or 1.5M -> int."""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def _artist_count(rows):
+    return max(rows // 4, 1)
+
+
+def synthetic_catalog(path, rows, seed=0, chunk_rows=500_000):
+    """Write a dataset.csv look-alike (same columns and dtypes) with rows rows.
+
+    Song s is "Song s" by "Artist (s % artists)", so synthetic_history can name
+    catalog songs without reading the file back. Written chunk_rows at a time,
+    so 10M rows take minutes but little memory.
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    artists = _artist_count(rows)
+    with open(path + ".tmp", "w", encoding="utf-8", newline="") as f:
+        for start in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - start)
+            row = np.arange(start, start + n)
+            duplicate = rng.random(n) < DUPLICATE_SHARE
+            song = np.where(duplicate, (rng.random(n) * row).astype(np.int64), row)
+            primary = pd.Series(song % artists).astype(str)
+            second = pd.Series(rng.integers(0, artists, n)).astype(str)
+            featured = rng.random(n) < FEATURE_SHARE
+            names = "Song " + pd.Series(song).astype(str)
+            chunk = pd.DataFrame({
+                "Unnamed: 0": row,
+                "track_id": "trk" + pd.Series(song).astype(str).str.zfill(19),
+                "artists": ("Artist " + primary).where(~featured, "Artist " + primary + ";Artist " + second),
+                "album_name": "Album " + pd.Series(song // 10).astype(str),
+                "track_name": names,
+                "popularity": rng.integers(0, 101, n),
+                "duration_ms": rng.integers(30_000, 600_000, n),
+                "explicit": rng.random(n) < 0.1,
+                "danceability": rng.beta(5, 3, n).round(3),
+                "energy": rng.beta(4, 2, n).round(3),
+                "key": rng.integers(0, 12, n),
+                "loudness": (-rng.gamma(2, 4, n)).round(3),
+                "mode": rng.integers(0, 2, n),
+                "speechiness": rng.beta(1, 10, n).round(4),
+                "acousticness": rng.beta(1, 3, n).round(4),
+                "instrumentalness": rng.beta(0.3, 3, n).round(5),
+                "liveness": rng.beta(2, 8, n).round(3),
+                "valence": rng.beta(2, 2, n).round(3),
+                "tempo": rng.uniform(50, 220, n).round(3),
+                "time_signature": rng.choice([3, 4, 4, 4, 5], n),
+                "track_genre": np.array(GENRES)[rng.integers(0, len(GENRES), n)],
+            })
+            # The real file has the odd missing name; clean() has to drop those
+            chunk.loc[rng.random(n) < 1e-5, ["artists", "album_name", "track_name"]] = None
+            chunk.to_csv(f, header=start == 0, index=False)
+    os.replace(path + ".tmp", path)
+
+
+def synthetic_history(folder, plays, catalog_rows, seed=0, known_share=0.8):
+    """Write StreamingHistory_music_<n>.json files with plays plays.
+
+    known_share of the plays are of catalog songs (as named by
+    synthetic_catalog, a few heavy favourites and a long tail), the rest of
+    songs the catalog doesn't have. Plays span the year before 2025.
+    """
+    rng = np.random.default_rng(seed + 1)
+    artists = _artist_count(catalog_rows)
+    listened = rng.choice(catalog_rows, size=min(max(plays // 8, 1), catalog_rows), replace=False)
+    song = listened[np.minimum(rng.zipf(1.3, plays) - 1, len(listened) - 1)]
+    known = rng.random(plays) < known_share
+    other = rng.integers(0, max(plays // 20, 1), plays)
+    start = np.datetime64("2024-01-01T00:00").astype(np.int64)
+    end_time = np.sort(rng.integers(start, start + 366 * 24 * 60, plays)).astype("datetime64[m]")
+    ms_played = np.where(rng.random(plays) < SKIP_SHARE, rng.integers(0, 30_000, plays),
+                         rng.integers(60_000, 300_000, plays))
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    for n, begin in enumerate(range(0, plays, PLAYS_PER_FILE)):
+        records = [{
+            "endTime": str(end_time[i]).replace("T", " "),
+            "artistName": f"Artist {song[i] % artists}" if known[i] else f"Local Artist {other[i] % 50}",
+            "trackName": f"Song {song[i]}" if known[i] else f"Unreleased {other[i]}",
+            "msPlayed": int(ms_played[i]),
+        } for i in range(begin, min(begin + PLAYS_PER_FILE, plays))]
+        with open(os.path.join(folder, f"StreamingHistory_music_{n}.json"), "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+
+
+def dataset(rows, plays, seed=0, data_dir=BENCH_DIR):
+    """(csv path, history folder) for one size, generated on first use and reused after."""
+    csv_path = os.path.join(data_dir, f"catalog-{rows}-{seed}.csv")
+    history = os.path.join(data_dir, f"history-{rows}-{plays}-{seed}")
+    os.makedirs(data_dir, exist_ok=True)
+    if not os.path.exists(csv_path):
+        synthetic_catalog(csv_path, rows, seed)
+    if not os.path.exists(os.path.join(history, "StreamingHistory_music_0.json")):
+        synthetic_history(history, plays, rows, seed)
+    return csv_path, history
+
+
+def run_pipeline(csv_path, history, work_dir, mood="happy"):
+    """One cold run of final.py's flow; returns the stage records.
+
+    The catalog cache, its canonical songs and the play log are rebuilt from
+    scratch, then the cached catalog is loaded the way every later run would.
+    """
+    cache_dir, log_dir = os.path.join(work_dir, "catalog"), os.path.join(work_dir, "playlog")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    shutil.rmtree(log_dir, ignore_errors=True)
+    stages.enable()
+    try:
+        build_cache(csv_path, cache_dir)
+        build_canonical(cache_dir)
+        songs, df = canonical_catalog(cache_dir)
+        play_log = PlayLog(history, root=log_dir)
+        play_log.ingest()
+        df = listened_songs(songs, df, play_log)
+        if not df.empty:
+            recommend_mood(df, mood)
+    finally:
+        recorder = stages.disable()
+    return recorder.records()
+
+
+def summarize(runs):
+    """Best (minimum) time per stage over repeated runs; rows and peak RSS from the last run."""
+    summary = {}
+    for records in runs:
+        for record in records:
+            best = summary.setdefault(record["name"], dict(record, wall_s=float("inf"), cpu_s=float("inf")))
+            best["wall_s"] = min(best["wall_s"], record["wall_s"])
+            best["cpu_s"] = min(best["cpu_s"], record["cpu_s"])
+            best.update(rows=record["rows"], peak_rss_mb=record["peak_rss_mb"])
+    summary["total"] = {"name": "total", "depth": 0, "rows": None, "peak_rss_mb": None, "peak_growth_mb": None,
+                        "wall_s": min(sum(r["wall_s"] for r in records if r["depth"] == 0) for records in runs),
+                        "cpu_s": min(sum(r["cpu_s"] for r in records if r["depth"] == 0) for records in runs)}
+    return summary
+
+
+def benchmark(sizes, plays, repeat=3, seed=0, mood="happy", data_dir=BENCH_DIR):
+    """{"<rows> rows x <plays> plays": {stage: record}} for every catalog size, smallest first.
+
+    Peak RSS is the process high-water mark, which is why sizes run in
+    ascending order.
+    """
+    results = {}
+    for rows in sorted(sizes):
+        csv_path, history = dataset(rows, plays, seed, data_dir)
+        runs = [run_pipeline(csv_path, history, os.path.join(data_dir, "work"), mood) for _ in range(repeat)]
+        results[f"{rows} rows x {plays} plays"] = summarize(runs)
+    shutil.rmtree(os.path.join(data_dir, "work"), ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD, min_seconds=MIN_SECONDS):
+    """[(size, stage, baseline s, new s)] for every stage that got slower than allowed."""
+    regressions = []
+    for size, summary in results.items():
+        for name, record in summary.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if record["wall_s"] > base["wall_s"] * (1 + threshold) and record["wall_s"] - base["wall_s"] > min_seconds:
+                regressions.append((size, name, base["wall_s"], record["wall_s"]))
+    return regressions
+
+
+def report(results, baseline=None, file=sys.stdout):
+    for size, summary in results.items():
+        print(f"\n{size}", file=file)
+        width = max(len("  " * r["depth"] + name) for name, r in summary.items())
+        print(f"  {'stage':<{width}}  {'wall s':>8}  {'cpu s':>8}  {'rows':>9}  {'vs base':>8}", file=file)
+        for name, record in summary.items():
+            base = (baseline or {}).get(size, {}).get(name)
+            change = f"{record['wall_s'] / base['wall_s'] - 1:+8.0%}" if base and base["wall_s"] > 0 else "-".rjust(8)
+            rows = f"{record['rows']:>9d}" if record["rows"] is not None else "-".rjust(9)
+            print(f"  {'  ' * record['depth'] + name:<{width}}  {record['wall_s']:8.3f}  {record['cpu_s']:8.3f}  "
+                  f"{rows}  {change}", file=file)
+
+
+def machine():
+    return {"platform": platform.platform(), "python": platform.python_version(), "numpy": np.__version__,
+            "cpus": os.cpu_count(), "created": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the final.py flow on synthetic data")
+    parser.add_argument("--rows", nargs="+", default=["10k", "100k"], help="catalog sizes (e.g. 10k 1M 10M)")
+    parser.add_argument("--plays", default="20k", help="plays in the synthetic streaming history")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size (the fastest counts)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mood", default="happy")
+    parser.add_argument("--data", default=BENCH_DIR, help="where synthetic data and results are kept")
+    parser.add_argument("--baseline", help="baseline file (default <data>/baseline.json)")
+    parser.add_argument("--save", action="store_true", help="record these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown per stage (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or os.path.join(args.data, "baseline.json")
+    results = benchmark([parse_count(rows) for rows in args.rows], parse_count(args.plays), args.repeat, args.seed,
+                        args.mood, args.data)
+    baseline = None
+    if not args.save and os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    report(results, baseline and baseline["results"])
+
+    document = {"machine": machine(), "results": results}
+    with open(os.path.join(args.data, "latest.json"), "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    if args.save:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"\nBaseline saved to {baseline_path}")
+    elif baseline is not None:
+        if baseline["machine"]["platform"] != document["machine"]["platform"]:
+            print(f"\nNote: baseline was recorded on {baseline['machine']['platform']}")
+        regressions = compare(results, baseline["results"], args.threshold)
+        for size, name, before, after in regressions:
+            print(f"REGRESSION {size}: {name} {before:.3f}s -> {after:.3f}s ({after / before - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"\nNo stage more than {args.threshold:.0%} slower than {baseline_path}")
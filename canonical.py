@@ -0,0 +1,212 @@
+# Canonical songs
+# Collapses the catalog's duplicate rows (the same song listed under several genres, or
+# spelled "SONG (FEAT. X)" and "Song (feat. X)") into one row per song, once per catalog
+# version, and keeps the row -> song mapping and every song's genres in .catalog_cache/
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from catalog import CACHE_DIR, cached_manifest, catalog_version, feature_matrix, load_columns, load_strings, \
+    save_strings
+from stages import stage
+
+CANONICAL_DIR = "canonical"
+FORMAT = 1
+
+_FEATURING = r"\s*[\(\[]\s*(?:feat|ft|featuring|with)\b[^\)\]]*[\)\]]|\s+(?:feat|ft|featuring)\b\.?\s.*$"
+
+
+def _clean(values):
+    """Lowercase, drop "(feat. ...)" clauses and punctuation, collapse whitespace (pandas str Series)."""
+    lowered = values.str.lower().str.strip()
+    cleaned = (lowered.str.replace(_FEATURING, "", regex=True)
+               .str.replace(r"[^\w\s]", "", regex=True)
+               .str.replace(r"[\s_]+", " ", regex=True).str.strip())
+    return cleaned.where(cleaned != "", lowered)   # titles like "!!!" keep their punctuation
+
+
+def title_key(titles):
+    """Canonical form of song titles: "Safe Retreat (feat. Braille)" -> "safe retreat"."""
+    return _clean(titles)
+
+
+def artist_key(artists):
+    """Canonical primary artist: first of "A;B", without "feat. C", punctuation or case."""
+    return _clean(artists.str.split(";", n=1).str[0])
+
+
+def normalized_codes(column, normalize):
+    """Normalize only the distinct values of column, then map them back to rows.
+
+    Returns an integer code per row (-1 where the value is missing) and the
+    normalized vocabulary (a pandas Index) those codes index into.
+    """
+    import pandas as pd
+
+    raw_codes, raw_uniques = pd.factorize(column)
+    codes, vocab = pd.factorize(normalize(pd.Series(raw_uniques, dtype=object).astype(str)))
+    return np.append(codes, -1)[raw_codes], pd.Index(vocab)
+
+
+def song_keys(track_names, artists):
+    """(title key, primary artist key) of every row as object arrays, "" where a name is missing."""
+    titles, title_vocab = normalized_codes(track_names, title_key)
+    artist_codes, artist_vocab = normalized_codes(artists, artist_key)
+    return (np.append(title_vocab.to_numpy(dtype=object), "")[titles],
+            np.append(artist_vocab.to_numpy(dtype=object), "")[artist_codes])
+
+
+def build_canonical(cache_dir=CACHE_DIR):
+    """Group the cached catalog's rows into songs and write <cache_dir>/canonical/.
+
+    Songs are numbered in order of their first row, and that first row is the
+    one kept (features, name, artists), so keeping the first duplicate and
+    ranking ties by position behave as before.
+    """
+    import pandas as pd
+
+    with stage("canonicalize catalog") as s:
+        columns = load_columns(["track_name", "artists", "track_genre"], cache_dir)
+        titles, title_vocab = normalized_codes(columns["track_name"], title_key)
+        artists, artist_vocab = normalized_codes(columns["artists"], artist_key)
+        song_of_row, pairs = pd.factorize(titles.astype(np.int64) * max(len(artist_vocab), 1) + artists)
+        first_row = np.full(len(pairs), len(song_of_row), dtype=np.int64)
+        np.minimum.at(first_row, song_of_row, np.arange(len(song_of_row)))
+
+        # Every song's distinct genres in catalog order ("acoustic;edm"); only songs listed
+        # under several genres need a join, the rest take their one genre by position
+        genre_codes, genre_names = pd.factorize(pd.Series(columns["track_genre"], dtype=object))
+        listed = pd.DataFrame({"song": song_of_row, "genre": genre_codes})
+        listed = listed[listed["genre"] >= 0].drop_duplicates().sort_values("song", kind="stable")
+        song, genre = listed["song"].to_numpy(), listed["genre"].to_numpy()
+        names = np.append(genre_names.to_numpy(dtype=object), "")   # -1 (no genre) picks ""
+        counts = np.bincount(song, minlength=len(pairs))
+        starts = np.cumsum(counts) - counts
+        first_genre = np.full(len(pairs), -1, dtype=np.intp)
+        first_genre[counts > 0] = genre[starts[counts > 0]]
+        genres = names[first_genre]
+        for i in np.flatnonzero(counts > 1):
+            genres[i] = ";".join(names[genre[starts[i]:starts[i] + counts[i]]])
+
+        path = os.path.join(cache_dir, CANONICAL_DIR)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        np.save(os.path.join(path, "song_of_row.npy"), song_of_row.astype(np.int32))
+        np.save(os.path.join(path, "first_row.npy"), first_row)
+        np.save(os.path.join(path, "features.npy"), np.ascontiguousarray(feature_matrix(cache_dir)[first_row]))
+        np.save(os.path.join(path, "pairs.npy"), np.asarray(pairs, dtype=np.int64))
+        save_strings(os.path.join(path, "title_vocab"), title_vocab.to_numpy(dtype=object))
+        save_strings(os.path.join(path, "artist_vocab"), artist_vocab.to_numpy(dtype=object))
+        save_strings(os.path.join(path, "genres"), genres)
+        with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT, "catalog": catalog_version(cache_dir), "rows": len(song_of_row),
+                       "songs": len(pairs), "titles": len(title_vocab), "artists": len(artist_vocab)}, f, indent=2)
+        s.rows = len(pairs)
+
+
+class Canonical:
+    """The persisted canonical songs of the cached catalog (rebuilt when the catalog changes)."""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        cached_manifest(cache_dir=cache_dir)
+        path = os.path.join(cache_dir, CANONICAL_DIR)
+        manifest = self._read_manifest(path)
+        if manifest is None or manifest["format"] != FORMAT or manifest["catalog"] != catalog_version(cache_dir):
+            build_canonical(cache_dir)
+            manifest = self._read_manifest(path)
+        self.cache_dir = cache_dir
+        self.path = path
+        self.manifest = manifest
+        self.songs = manifest["songs"]
+        self.song_of_row = np.load(os.path.join(path, "song_of_row.npy"))
+        self.first_row = np.load(os.path.join(path, "first_row.npy"))
+        self.genres = load_strings(os.path.join(path, "genres"), self.songs)
+        self._index = None   # (title vocab, artist vocab, pairs), loaded by the first lookup
+
+    @staticmethod
+    def _read_manifest(path):
+        try:
+            with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def features(self, mmap_mode="r"):
+        """Feature matrix with one row per song (float32), memory-mapped."""
+        return np.load(os.path.join(self.path, "features.npy"), mmap_mode=mmap_mode)
+
+    def lookup(self, keys):
+        """Song id of every (track_key, artist_key) row of a history's keys, -1 where not in the catalog.
+
+        Both names are normalized like the catalog's and mapped onto its title and
+        artist vocabularies, so the match is an integer join on (title, artist) pairs.
+        """
+        import pandas as pd
+
+        if self._index is None:
+            self._index = (pd.Index(load_strings(os.path.join(self.path, "title_vocab"), self.manifest["titles"])),
+                           pd.Index(load_strings(os.path.join(self.path, "artist_vocab"), self.manifest["artists"])),
+                           pd.Index(np.load(os.path.join(self.path, "pairs.npy"))))
+        titles, artists, pairs = self._index
+        title_codes = titles.get_indexer(title_key(keys["track_key"].astype(object)))
+        artist_codes = artists.get_indexer(artist_key(keys["artist_key"].astype(object)))
+        found = (title_codes >= 0) & (artist_codes >= 0)
+        songs = np.full(len(found), -1, dtype=np.intp)
+        songs[found] = pairs.get_indexer(title_codes[found].astype(np.int64) * max(len(artists), 1)
+                                         + artist_codes[found])
+        return songs
+
+    def catalog(self):
+        """One row per song: its first catalog row, with "genres" listing every genre it appears under."""
+        import pandas as pd
+
+        manifest = cached_manifest(cache_dir=self.cache_dir)
+        data = load_columns([column["name"] for column in manifest["columns"]], self.cache_dir)
+        X = self.features()
+        columns = {}
+        for name in manifest["order"]:
+            if name in manifest["features"]:
+                columns[name] = X[:, manifest["features"].index(name)]
+            else:
+                columns[name] = data[name][self.first_row]
+        df = pd.DataFrame(columns)
+        df["genres"] = pd.Series(self.genres).str.replace(";", ", ")   # same string dtype as the other names
+        return df
+
+
+def canonical_catalog(cache_dir=CACHE_DIR):
+    """(Canonical, its one-row-per-song DataFrame), the catalog's duplicates collapsed once and cached."""
+    with stage("load canonical catalog") as s:
+        songs = Canonical(cache_dir)
+        df = songs.catalog()
+        s.rows = len(df)
+    return songs, df
+
+
+def filter_songs(songs, df, keys):
+    """Rows of a canonical catalog DataFrame whose song is in a history's keys."""
+    with stage("history filter") as s:
+        listened = songs.lookup(keys)
+        mask = np.zeros(songs.songs + 1, dtype=bool)
+        mask[listened[listened >= 0]] = True
+        df = df[mask[:-1]]
+        s.rows = len(df)
+    return df
+
+
+if __name__ == "__main__":
+    import time
+
+    import pandas as pd
+
+    # Rebuild the canonical songs and show how much they collapse the catalog
+    start = time.perf_counter()
+    build_canonical()
+    songs = Canonical()
+    print(f"{len(songs.song_of_row)} catalog rows -> {songs.songs} songs in {time.perf_counter() - start:.2f}s")
+    counts = np.bincount(songs.song_of_row, minlength=songs.songs)
+    print(f"{np.count_nonzero(counts > 1)} songs had duplicate rows, "
+          f"{np.count_nonzero(pd.Series(songs.genres).str.contains(';'))} appear under several genres")
@@ -0,0 +1,232 @@
+# Catalog cache
+# Loads the Kaggle Spotify tracks dataset once (dropna + MinMax scaling) and keeps the
+# result on disk so later runs skip CSV parsing entirely
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from moodscore import numeric_features
+from stages import stage
+
+DATASET = "maharshipandya/-spotify-tracks-dataset"
+CACHE_DIR = ".catalog_cache"
+FORMAT = 1
+
+
+def dataset_csv():
+    """Download (or reuse kagglehub's copy of) the dataset and return the CSV path."""
+    with stage("kaggle download"):
+        import kagglehub
+
+        return os.path.join(kagglehub.dataset_download(DATASET), "dataset.csv")
+
+
+def file_hash(path):
+    """sha256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fit_scaler(X):
+    """MinMaxScaler parameters for X, computed the same way sklearn does."""
+    data_min = np.nanmin(X, axis=0)
+    data_max = np.nanmax(X, axis=0)
+    data_range = data_max - data_min
+    scale = 1.0 / np.where(data_range == 0, 1.0, data_range)
+    return {
+        "data_min": data_min.tolist(),
+        "data_max": data_max.tolist(),
+        "scale": scale.tolist(),
+        "min": (-data_min * scale).tolist(),
+    }
+
+
+def scale_features(X, scaler):
+    """Apply saved MinMax parameters to a raw feature matrix."""
+    X = np.array(X, dtype=np.float64)
+    X *= np.asarray(scaler["scale"])
+    X += np.asarray(scaler["min"])
+    return X
+
+
+def clean(df, features=numeric_features):
+    """Drop rows the recommender can't use (missing features, name or artists)."""
+    return df.dropna(subset=features + ["track_name", "artists"])
+
+
+def save_strings(path, values):
+    """Write a string column as one NUL-separated UTF-8 blob (plus a null mask)."""
+    import pandas as pd
+
+    values = pd.Series(values, dtype=object)
+    nulls = values.isna().to_numpy()
+    text = values.where(~nulls, "").astype(str).tolist()
+    blob = "\0".join(text)
+    if blob.count("\0") != max(len(text) - 1, 0):
+        raise ValueError(f"{path}: strings can't contain NUL characters")
+    with open(path + ".utf8", "wb") as f:
+        f.write(blob.encode("utf-8"))
+    if nulls.any():
+        np.save(path + ".nulls.npy", nulls)
+
+
+def load_strings(path, rows):
+    """Read a column written by save_strings back into an object array."""
+    with open(path + ".utf8", "rb") as f:
+        text = f.read().decode("utf-8")
+    values = np.array(text.split("\0") if rows else [], dtype=object)
+    if os.path.exists(path + ".nulls.npy"):
+        values[np.load(path + ".nulls.npy")] = None
+    return values
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format") == FORMAT else None
+
+
+def _write_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, "manifest.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _is_current(manifest, csv_path, cache_dir):
+    """Check the cache against the source CSV (size/mtime first, hash if those changed)."""
+    stat = os.stat(csv_path)
+    if (manifest["source"] == os.path.abspath(csv_path)
+            and manifest["size"] == stat.st_size and manifest["mtime_ns"] == stat.st_mtime_ns):
+        return True
+    if manifest["size"] != stat.st_size or manifest["sha256"] != file_hash(csv_path):
+        return False
+    # Same bytes (e.g. touched or re-downloaded), just remember the new stat
+    manifest.update(source=os.path.abspath(csv_path), mtime_ns=stat.st_mtime_ns)
+    _write_manifest(cache_dir, manifest)
+    return True
+
+
+def build_cache(csv_path, cache_dir=CACHE_DIR, features=numeric_features):
+    """Parse, clean and scale the CSV, then write the cache files."""
+    import pandas as pd
+
+    stat = os.stat(csv_path)
+    with stage("read csv") as s:
+        df = pd.read_csv(csv_path)
+        s.rows = len(df)
+    with stage("dropna + scale") as s:
+        df = clean(df, features)
+        scaler = fit_scaler(df[features].to_numpy(dtype=np.float64))
+        scaled = scale_features(df[features].to_numpy(dtype=np.float64), scaler)
+        s.rows = len(df)
+
+    with stage("write catalog cache"):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.makedirs(cache_dir)
+        np.save(os.path.join(cache_dir, "features.npy"), np.ascontiguousarray(scaled, dtype=np.float32))
+
+        columns = []
+        for i, name in enumerate(df.columns):
+            if name in features:
+                continue
+            path = os.path.join(cache_dir, f"col{i}")
+            if df[name].dtype.kind in "biufcmM":
+                np.save(path + ".npy", df[name].to_numpy())
+                columns.append({"name": name, "file": f"col{i}", "kind": "array"})
+            else:
+                save_strings(path, df[name])
+                columns.append({"name": name, "file": f"col{i}", "kind": "strings"})
+
+        _write_manifest(cache_dir, {
+            "format": FORMAT,
+            "source": os.path.abspath(csv_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_hash(csv_path),
+            "rows": len(df),
+            "features": features,
+            "columns": columns,
+            "order": list(df.columns),
+            "scaler": scaler,
+        })
+
+
+def cached_manifest(csv_path=None, cache_dir=CACHE_DIR, features=numeric_features):
+    """Make sure the cache is current and return its manifest.
+
+    With no csv_path the CSV recorded in the cache is checked; if it is gone
+    (offline, kagglehub cache cleared) the existing cache is used as is. Kaggle
+    is only contacted when there is no cache yet.
+    """
+    manifest = _read_manifest(cache_dir)
+    if manifest is not None and manifest["features"] != features:
+        manifest = None
+    if csv_path is None:
+        if manifest is not None and not os.path.exists(manifest["source"]):
+            return manifest
+        csv_path = manifest["source"] if manifest is not None else dataset_csv()
+    if manifest is None or not _is_current(manifest, csv_path, cache_dir):
+        build_cache(csv_path, cache_dir, features)
+        manifest = _read_manifest(cache_dir)
+    return manifest
+
+
+def feature_matrix(cache_dir=CACHE_DIR, mmap_mode="r"):
+    """The cached scaled feature matrix (float32, rows x features), memory-mapped."""
+    return np.load(os.path.join(cache_dir, "features.npy"), mmap_mode=mmap_mode)
+
+
+def catalog_version(cache_dir=CACHE_DIR):
+    """Identifier of the cached catalog's contents (changes whenever the source CSV does)."""
+    manifest = _read_manifest(cache_dir)
+    return manifest["sha256"][:16] if manifest else None
+
+
+def load_columns(names, cache_dir=CACHE_DIR):
+    """{name: array} for a few non-feature columns of a current cache (no pandas needed)."""
+    manifest = _read_manifest(cache_dir)
+    columns = {column["name"]: column for column in manifest["columns"]}
+    data = {}
+    for name in names:
+        path = os.path.join(cache_dir, columns[name]["file"])
+        if columns[name]["kind"] == "array":
+            data[name] = np.load(path + ".npy")
+        else:
+            data[name] = load_strings(path, manifest["rows"])
+    return data
+
+
+def load_catalog(csv_path=None, cache_dir=CACHE_DIR, features=numeric_features):
+    """Cleaned, scaled catalog DataFrame, served from the cache when possible."""
+    import pandas as pd
+
+    with stage("load catalog") as s:
+        manifest = cached_manifest(csv_path, cache_dir, features)
+        data = load_columns([column["name"] for column in manifest["columns"]], cache_dir)
+        X = feature_matrix(cache_dir)
+        for j, name in enumerate(manifest["features"]):
+            data[name] = X[:, j]
+        df = pd.DataFrame({name: data[name] for name in manifest["order"]})
+        s.rows = len(df)
+    return df
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # Build (if needed) and time a load of the catalog cache
+    start = time.perf_counter()
+    df = load_catalog(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"Catalog ready: {len(df)} songs in {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,171 @@
+# Out-of-core catalog
+# Runs final.py's catalog flow (dropna + scale, canonical songs, history filter, score, top k)
+# over a CSV read in chunks, so memory depends on the chunk size and the history, not the catalog
+#   python catalogstream.py dataset.csv --chunk-rows 100000 [--check]
+
+import numpy as np
+import pandas as pd
+
+from canonical import song_keys
+from catalog import clean, fit_scaler, scale_features
+from moodscore import mood_targets, numeric_features, score_matrix, target_matrix
+from ranking import top_k
+from stages import stage
+
+CHUNK_ROWS = 100_000
+TEXT_COLUMNS = ["track_id", "artists", "album_name", "track_name", "track_genre"]
+
+
+def read_chunks(csv_path, chunk_rows=CHUNK_ROWS, usecols=None):
+    """pd.read_csv in chunks of chunk_rows rows.
+
+    Text columns are always read as strings: a chunk that happens to hold only
+    numeric-looking titles would otherwise be parsed as numbers.
+    """
+    dtypes = {name: str for name in TEXT_COLUMNS if usecols is None or name in usecols}
+    return pd.read_csv(csv_path, chunksize=chunk_rows, usecols=usecols, dtype=dtypes)
+
+
+def stream_scaler(csv_path, chunk_rows=CHUNK_ROWS, features=numeric_features):
+    """MinMax parameters of the cleaned catalog (same as catalog.fit_scaler), from a first pass.
+
+    Only the feature and name columns are parsed; the min and max of every
+    chunk are kept and reduced at the end.
+    """
+    extremes, rows = [], 0
+    with stage("fit scaler") as s:
+        for chunk in read_chunks(csv_path, chunk_rows, usecols=features + ["track_name", "artists"]):
+            X = clean(chunk, features)[features].to_numpy(dtype=np.float64)
+            if len(X):
+                extremes += [np.nanmin(X, axis=0), np.nanmax(X, axis=0)]
+            rows += len(X)
+        s.rows = rows
+    return fit_scaler(np.array(extremes).reshape(-1, len(features)))
+
+
+class TopK:
+    """Running top k of every mood over chunks of scored rows.
+
+    Only rows that are in some mood's current top k are kept (at most
+    k x moods rows). Chunks arrive in catalog order and kept rows stay ahead of
+    new ones, so ties resolve to the earlier row exactly as one top_k over the
+    whole catalog would.
+    """
+
+    def __init__(self, moods, k=10):
+        self.moods = moods
+        self.k = k
+        self.rows = None
+        self.scores = np.empty((0, len(moods)), dtype=np.float64)
+
+    def add(self, rows, scores):
+        rows = rows if self.rows is None else pd.concat([self.rows, rows])
+        scores = np.concatenate([self.scores, scores])
+        picks = {mood: top_k(scores[:, j], self.k) for j, mood in enumerate(self.moods)}
+        keep = np.unique(np.concatenate(list(picks.values())))
+        self.rows, self.scores = rows.iloc[keep], scores[keep]
+
+    def results(self):
+        """{mood: top k rows with a mood_score column}, best first."""
+        results = {}
+        for j, mood in enumerate(self.moods):
+            if self.rows is None:
+                results[mood] = pd.DataFrame(columns=["mood_score"])
+                continue
+            positions = top_k(self.scores[:, j], self.k)
+            results[mood] = self.rows.iloc[positions].assign(mood_score=self.scores[positions, j])
+        return results
+
+
+def stream_recommendations(csv_path, keys, targets=mood_targets, k=10, chunk_rows=CHUNK_ROWS,
+                           features=numeric_features):
+    """{mood: top k DataFrame} for a catalog CSV and a user's history keys, chunk by chunk.
+
+    Same rows, columns and scores as the in-memory path (canonical_catalog,
+    filter_songs, score, top_rows) on that CSV: one row per canonical
+    song, its first catalog row, with every genre it is listed under. Rows are
+    indexed by that first row's position in the cleaned catalog. The only
+    state carried between chunks is the scaler, the genres of the history's
+    songs seen so far, and the running top k.
+    """
+    scaler = stream_scaler(csv_path, chunk_rows, features)
+    moods, T, W = target_matrix(targets, features)
+    best = TopK(moods, k)
+    listened = pd.MultiIndex.from_arrays(song_keys(keys["track_key"], keys["artist_key"]))
+    genres = {}   # song key -> genres in catalog order, for every history song seen so far
+    offset = 0    # position of the chunk's first row in the cleaned catalog (load_catalog's index)
+    with stage("score chunks") as s:
+        for chunk in read_chunks(csv_path, chunk_rows):
+            chunk = clean(chunk, features)
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            titles, artists = song_keys(chunk["track_name"], chunk["artists"])
+            in_history = pd.MultiIndex.from_arrays([titles, artists]).isin(listened)
+            rows = chunk[in_history]
+            if rows.empty:
+                continue
+            first = np.zeros(len(rows), dtype=bool)
+            for i, (key, genre) in enumerate(zip(zip(titles[in_history], artists[in_history]), rows["track_genre"])):
+                if key not in genres:
+                    genres[key], first[i] = [], True
+                if isinstance(genre, str) and genre not in genres[key]:
+                    genres[key].append(genre)
+            rows = rows[first]
+            if rows.empty:
+                continue
+
+            # Same values load_catalog serves: scaled in float64, stored as float32
+            X = scale_features(rows[features].to_numpy(dtype=np.float64), scaler).astype(np.float32)
+            rows = rows.assign(**{name: X[:, j] for j, name in enumerate(features)})
+            best.add(rows, score_matrix(X, T, W))
+        s.rows = offset
+
+    results = best.results()
+    for top in results.values():
+        listed = [genres[key] for key in zip(*song_keys(top["track_name"], top["artists"]))] if len(top) else []
+        top.insert(len(top.columns) - 1, "genres", [", ".join(names) for names in listed])
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    import time
+
+    from canonical import canonical_catalog, filter_songs
+    from catalog import cached_manifest
+    from final import recommend_mood
+    from history import load_history_keys
+    from stages import peak_rss_mb
+
+    parser = argparse.ArgumentParser(description="Top k songs per mood from a catalog CSV read in chunks")
+    parser.add_argument("csv", help="catalog CSV in the Kaggle dataset.csv layout")
+    parser.add_argument("--history", default="./streaminghistory")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--mood", default="happy", help="mood to print")
+    parser.add_argument("--check", action="store_true", help="also run the in-memory path and compare every mood")
+    args = parser.parse_args()
+
+    keys = load_history_keys(args.history)
+    start = time.perf_counter()
+    results = stream_recommendations(args.csv, keys, k=args.k, chunk_rows=args.chunk_rows)
+    print(f"Chunks of {args.chunk_rows} rows: {time.perf_counter() - start:.2f}s, peak RSS {peak_rss_mb():.0f} MB\n")
+    for i, row in enumerate(results[args.mood].itertuples(), start=1):
+        print(f"{i}. {row.track_name} — {row.artists}  (Genre: {row.genres}, Score: {row.mood_score:.3f})")
+
+    if args.check:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cached_manifest(args.csv, cache_dir)
+            songs, df = canonical_catalog(cache_dir)
+            df = filter_songs(songs, df, keys)
+        same = True
+        for mood in results:
+            expected, _ = recommend_mood(df.copy(), mood, args.k)
+            expected.index = songs.first_row[expected.index]   # song id -> position of its first row
+            try:
+                pd.testing.assert_frame_equal(results[mood], expected, check_index_type=False)
+            except AssertionError as error:
+                print(f"\n{mood}: {error}")
+                same = False
+        print(f"\nSame result as the in-memory path for all {len(results)} moods: {same}")
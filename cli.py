@@ -0,0 +1,145 @@
+# Command line interface
+# One entry point for the recommender scripts; every subcommand imports only what it needs
+# and reuses the cached catalog, play log, search index and results
+#   python cli.py recommend happy [--k 10]
+#   python cli.py lookup "I'm Yours" --artist "Jason Mraz"
+#   python cli.py count [--top 10]
+#   python cli.py top-artists [--n 10] [--since 2025-01-01] [--until 2025-07-01]
+#   python cli.py --profile-startup recommend happy
+
+import argparse
+import os
+import sys
+
+import stages
+from stages import stage
+
+RESULTS_DIR = os.path.join(".catalog_cache", "results")
+
+
+def _ingest(folder):
+    with stage("import playlog (numpy)"):
+        from playlog import PlayLog
+    with stage("open play log"):
+        log = PlayLog(folder)
+        log.ingest()
+    return log
+
+
+def recommend(args):
+    """Top k songs for a mood, answered from the on-disk result cache when nothing changed."""
+    log = _ingest(args.history)
+    with stage("check catalog / result cache"):
+        from catalog import cached_manifest, catalog_version
+        from resultcache import ResultCache, scoring_options
+
+        cached_manifest()
+        cache = ResultCache(disk_dir=RESULTS_DIR)
+        cache.set_versions(catalog_version(), log.version)
+        options = scoring_options(args.affinity, args.rules)
+        tracks = cache.get(args.mood, args.k, options)
+    if tracks is None:
+        with stage("import recommender (pandas)"):
+            from moodscore import mood_targets
+            from server import load_recommender
+        if args.mood not in mood_targets:
+            sys.exit(f"Unknown mood '{args.mood}'. Available moods: {', '.join(sorted(mood_targets))}")
+        with stage("load, filter and score catalog"):
+            recommender = load_recommender(args.history, args.affinity, args.rules)
+            for mood in recommender.targets:   # every mood is already scored, keep them all warm
+                cache.put(mood, args.k, recommender.recommend(mood, args.k), options, recommender.versions)
+            tracks = recommender.recommend(args.mood, args.k)
+
+    print(f"Top {len(tracks)} tracks for mood '{args.mood}':\n")
+    for i, track in enumerate(tracks, start=1):
+        print(f"{i}. {track['track_name']} — {track['artists']}  "
+              f"(Genre: {track['genre']}, Score: {track['mood_score']:.3f})")
+
+
+def lookup(args):
+    """Fuzzy search of the catalog by title (and artist), like inDB.py."""
+    with stage("import song search (numpy)"):
+        from catalog import cached_manifest, load_columns
+        from songsearch import load_index
+    with stage("load search index"):
+        cached_manifest()
+        index = load_index()
+    with stage("load catalog names"):
+        columns = load_columns(["track_name", "artists", "track_genre"])
+    found = index.search(args.title, args.artist, k=args.k)
+    if not found:
+        print(f"'{args.title}' not found in dataset.")
+    for pos, score in found:
+        print(f"{score:.2f}  {columns['track_name'][pos]} — {columns['artists'][pos]}  "
+              f"(Genre: {columns['track_genre'][pos]})")
+
+
+def count(args):
+    """Number of unique songs played (songdata.py), optionally the most played ones."""
+    log = _ingest(args.history)
+    with stage("count plays"):
+        import numpy as np
+
+        from ranking import top_k
+        from songdata import playlog_counts
+
+        songs, counts = playlog_counts(log)
+    print(np.count_nonzero(counts))
+    for i, track_id in enumerate(top_k(counts, args.top), start=1):
+        print(f"{i}. {songs.label(track_id)} ({counts[track_id]} plays)")
+
+
+def top_artists(args):
+    """Most played artists by number of plays, with hours listened (optionally in an endTime window)."""
+    log = _ingest(args.history)
+    with stage("count plays per artist"):
+        from rollups import Rollups
+        from streaminghistory import top_artists as most_played
+
+        rows = most_played(log, Rollups.load(log), args.n, args.since, args.until)
+    for i, (artist, plays, hours) in enumerate(rows, start=1):
+        print(f"{i}. {artist} ({plays} plays, {hours:.1f} h)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fuzzy mood song recommender")
+    parser.add_argument("--history", default="./streaminghistory", help="folder of StreamingHistory JSON files")
+    parser.add_argument("--profile-startup", action="store_true", help="report import and load stage times (stderr)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("recommend", help="top k songs for a mood")
+    command.add_argument("mood", type=str.lower)
+    command.add_argument("--k", type=int, default=10)
+    command.add_argument("--affinity", action="store_true", help="blend play count / skips / recency into scores")
+    command.add_argument("--rules", help="score moods with a fuzzy rule base (e.g. rules/moods.json)")
+    command.set_defaults(run=recommend)
+
+    command = commands.add_parser("lookup", help="search the dataset for a song")
+    command.add_argument("title")
+    command.add_argument("--artist")
+    command.add_argument("--k", type=int, default=10)
+    command.set_defaults(run=lookup)
+
+    command = commands.add_parser("count", help="number of unique songs played")
+    command.add_argument("--top", type=int, default=0, help="also list the n most played songs")
+    command.set_defaults(run=count)
+
+    command = commands.add_parser("top-artists", help="most played artists")
+    command.add_argument("--n", type=int, default=10)
+    command.add_argument("--since", help="first endTime to count, e.g. 2025-01-01")
+    command.add_argument("--until", help="count plays before this endTime")
+    command.set_defaults(run=top_artists)
+
+    args = parser.parse_args(argv)
+    # --profile-startup is RECOMMENDER_STAGES=table for one run (which reports at exit itself)
+    recorder = stages.enable() if args.profile_startup and stages.recorder() is None else None
+    try:
+        with stage(args.command):
+            args.run(args)
+    finally:
+        if recorder is not None:
+            recorder.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# Playlist evaluation
+# Compares generated playlists with reference playlists (e.g. Spotify's own) for every
+# mood at once: each reference track is resolved with one keyed join, then all mood
+# scores are averaged in a single vectorized pass
+#   python evaluate.py playlists/*.json [--k 10] [--out summary.csv]
+
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from moodscore import mood_targets, score_moods
+from ranking import top_k_moods
+
+
+def track_lookup(df):
+    """Keyed table (track_key, artist_key) -> first row position, one entry per listed artist.
+
+    Matches the old per-song check (same title, artist listed on the track)
+    without scanning the catalog for every song.
+    """
+    artists = df["artists"].fillna("").astype(str).str.lower().str.split(";")
+    keys = pd.DataFrame({
+        "track_key": df["track_name"].fillna("").astype(str).str.lower().to_numpy(),
+        "artist_key": artists.to_numpy(),
+        "position": np.arange(len(df)),
+    }).explode("artist_key")
+    return keys.drop_duplicates(["track_key", "artist_key"])
+
+
+def resolve(tracks, lookup):
+    """Row position of every {"track_name", "artist"} entry (-1 when it isn't in the catalog)."""
+    wanted = pd.DataFrame({
+        "track_key": [str(t["track_name"]).lower().strip() for t in tracks],
+        "artist_key": [str(t["artist"]).lower().strip() for t in tracks],
+    })
+    merged = wanted.merge(lookup, how="left", on=["track_key", "artist_key"])
+    return merged["position"].fillna(-1).astype(np.int64).to_numpy()
+
+
+def playlist_scores(df, tracks, column="mood_score", lookup=None):
+    """Per-song comparison table for one playlist (catalog names and score where found)."""
+    positions = resolve(tracks, track_lookup(df) if lookup is None else lookup)
+    found = positions >= 0
+    rows = df.iloc[positions[found]]
+    table = pd.DataFrame({
+        "track_name": [t["track_name"] for t in tracks],
+        "artist": [t["artist"] for t in tracks],
+        column: np.nan,
+    })
+    table.loc[found, "track_name"] = rows["track_name"].to_numpy()
+    table.loc[found, "artist"] = rows["artists"].to_numpy()
+    table.loc[found, column] = rows[column].to_numpy()
+    return table
+
+
+def load_playlists(paths):
+    """Read reference playlists from JSON or CSV files into {name: {"mood", "tracks"}}.
+
+    JSON files hold either a list of {"track_name", "artist"} entries or an object
+    with "tracks" (and optionally "name" and "mood"). CSV files need track_name and
+    artist columns, plus optional playlist and mood columns to hold several playlists.
+    """
+    playlists = {}
+    for path in paths:
+        default = os.path.splitext(os.path.basename(path))[0]
+        if path.endswith(".csv"):
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    playlist = playlists.setdefault(row.get("playlist") or default,
+                                                    {"mood": row.get("mood") or None, "tracks": []})
+                    playlist["tracks"].append({"track_name": row["track_name"], "artist": row["artist"]})
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, list):
+                data = {"tracks": data}
+            playlists[data.get("name", default)] = {"mood": data.get("mood"), "tracks": data["tracks"]}
+    return playlists
+
+
+def evaluate(df, playlists, targets=mood_targets, k=10):
+    """Summary table of generated vs reference mood scores for every playlist and mood.
+
+    Columns: playlist, mood, reference mood (if tagged), generated_mean (top k for
+    that mood), reference_mean, difference, found/tracks and coverage.
+    """
+    moods = list(targets)
+    scores = score_moods(df, targets).to_numpy()
+    generated = top_k_moods(scores, moods, k)
+    generated_mean = np.array([scores[generated[mood], j].mean() for j, mood in enumerate(moods)])
+
+    names = list(playlists)
+    tracks = [track for name in names for track in playlists[name]["tracks"]]
+    owner = np.repeat(np.arange(len(names)), [len(playlists[name]["tracks"]) for name in names])
+    positions = resolve(tracks, track_lookup(df))
+    found = positions >= 0
+
+    # Mean of every mood column per playlist in one pass (sum via bincount over found tracks)
+    counts = np.bincount(owner[found], minlength=len(names))
+    sums = np.stack([np.bincount(owner[found], weights=scores[positions[found], j], minlength=len(names))
+                     for j in range(len(moods))], axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        reference_mean = sums / counts[:, None]
+    totals = np.bincount(owner, minlength=len(names))
+
+    summary = pd.DataFrame({
+        "playlist": np.repeat(names, len(moods)),
+        "reference_mood": np.repeat([playlists[name]["mood"] for name in names], len(moods)),
+        "mood": np.tile(moods, len(names)),
+        "generated_mean": np.tile(generated_mean, len(names)),
+        "reference_mean": reference_mean.ravel(),
+        "found": np.repeat(counts, len(moods)),
+        "tracks": np.repeat(totals, len(moods)),
+    })
+    summary["difference"] = (summary["generated_mean"] - summary["reference_mean"]).abs()
+    summary["coverage"] = summary["found"] / summary["tracks"].clip(lower=1)
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from history import listened_catalog
+    from playlog import PlayLog
+
+    parser = argparse.ArgumentParser(description="Compare generated playlists with reference playlists")
+    parser.add_argument("playlists", nargs="+", help="JSON/CSV playlist files")
+    parser.add_argument("--k", type=int, default=10, help="generated playlist length")
+    parser.add_argument("--history", default="./streaminghistory")
+    parser.add_argument("--out", help="write the summary table to this CSV file")
+    args = parser.parse_args()
+
+    log = PlayLog(args.history)
+    log.ingest()
+    _, df = listened_catalog(log)
+    summary = evaluate(df, load_playlists(args.playlists), k=args.k)
+    tagged = summary[summary["reference_mood"].isna() | (summary["mood"] == summary["reference_mood"])]
+    print(tagged.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    if args.out:
+        summary.to_csv(args.out, index=False)
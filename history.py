@@ -0,0 +1,86 @@
+# History keys
+# Reduces the streaming history (JSON files or an ingested PlayLog) to unique
+# (track, primary artist) keys, which canonical.filter_songs matches against the catalog
+
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from canonical import canonical_catalog, filter_songs, normalized_codes
+from stages import stage
+
+
+def _lower(values):
+    return values.str.lower()
+
+
+def _primary_lower(values):
+    return values.str.split(";", n=1).str[0].str.lower()
+
+
+def track_keys(track_names):
+    """Lowercased track names for a column of track names, "" where missing."""
+    codes, vocab = normalized_codes(track_names, _lower)
+    return pd.Series(np.append(vocab.to_numpy(dtype=object), "")[codes], index=track_names.index)
+
+
+def artist_keys(artists):
+    """Primary (first listed) artist, lowercased, for a column of artist strings."""
+    codes, vocab = normalized_codes(artists, _primary_lower)
+    return pd.Series(np.append(vocab.to_numpy(dtype=object), "")[codes], index=artists.index)
+
+
+def history_keys(entries):
+    """Unique (track_key, artist_key) pairs for a list of streaming history entries."""
+    plays = pd.DataFrame(entries, columns=["trackName", "artistName"])
+    keys = pd.DataFrame({
+        "track_key": track_keys(plays["trackName"]),
+        "artist_key": artist_keys(plays["artistName"]),
+    })
+    keys = keys[(keys["track_key"] != "") & (keys["artist_key"] != "")]
+    return keys.drop_duplicates(ignore_index=True)
+
+
+def load_history_keys(folder="./streaminghistory"):
+    """Load every StreamingHistory JSON file in folder and return its unique keys."""
+    with stage("parse history JSON") as s:
+        entries = []
+        for file in glob.glob(os.path.join(folder, "*.json")):
+            with open(file, "r", encoding="utf-8") as f:
+                entries.extend(json.load(f))
+        s.rows = len(entries)
+    return history_keys(entries)
+
+
+def playlog_track_keys(log):
+    """(track_key, artist_key) of every PlayLog track id, in id order (not deduplicated)."""
+    tracks = pd.Series([name for _, name in log.tracks], dtype=object)
+    artists = pd.Series(np.array(log.artists, dtype=object)[log.track_artist_ids()], dtype=object)
+    return pd.DataFrame({"track_key": track_keys(tracks), "artist_key": artist_keys(artists)})
+
+
+def playlog_keys(log):
+    """Unique history keys straight from a PlayLog's track dictionary (see playlog.py)."""
+    keys = playlog_track_keys(log)
+    keys = keys[(keys["track_key"] != "") & (keys["artist_key"] != "")]
+    return keys.drop_duplicates(ignore_index=True)
+
+
+def listened_catalog(log):
+    """(Canonical, its songs in an ingested PlayLog): the same rows final.py scores (see canonical.py)."""
+    songs, df = canonical_catalog()
+    return songs, filter_songs(songs, df, playlog_keys(log))
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # Parse a streaming history folder and show how many distinct songs it holds
+    folder = sys.argv[1] if len(sys.argv) > 1 else "./streaminghistory"
+    start = time.perf_counter()
+    keys = load_history_keys(folder)
+    print(f"{len(keys)} distinct (track, artist) keys in {folder} ({time.perf_counter() - start:.2f}s)")
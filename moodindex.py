@@ -0,0 +1,171 @@
+# Mood index
+# Nearest-neighbor index over the scaled audio features, so "top k songs for this
+# mood" doesn't have to score every song in the catalog
+
+import numpy as np
+
+from moodscore import numeric_features, score_matrix, target_matrix
+from ranking import top_k
+
+# Buckets scanned per query by default (pass nprobe=None for exact search)
+NPROBE = 32
+
+
+def _nearest_centroid(X, centroids, chunk_size=2048):
+    """Index of the closest centroid (squared L2) for every row of X."""
+    c_norms = (centroids ** 2).sum(axis=1)
+    labels = np.empty(len(X), dtype=np.int32)
+    for start in range(0, len(X), chunk_size):
+        distances = X[start:start + chunk_size] @ centroids.T
+        distances *= -2
+        distances += c_norms
+        labels[start:start + len(distances)] = distances.argmin(axis=1)
+    return labels
+
+
+def kmeans(X, n_clusters, n_iter=10, sample_size=65536, seed=0):
+    """Plain Lloyd's k-means on a random sample of X; returns the centroids."""
+    rng = np.random.default_rng(seed)
+    sample = X[rng.choice(len(X), min(len(X), max(sample_size, n_clusters)), replace=False)]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _nearest_centroid(sample, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        for j in range(X.shape[1]):
+            sums = np.bincount(labels, weights=sample[:, j], minlength=n_clusters)
+            centroids[:, j] = np.where(counts > 0, sums / np.maximum(counts, 1), centroids[:, j])
+    return centroids
+
+
+class MoodIndex:
+    """IVF-style index: tracks are bucketed by k-means cluster, each bucket stored
+    contiguously together with its per-feature bounding box.
+
+    By default only the nprobe buckets with the closest centroids are scanned
+    (approximate). With nprobe=None the search is exact: a query's weighted L1
+    distance to a bucket's box is a lower bound for every track inside it, so
+    buckets are visited nearest-box-first until none can beat the k-th result.
+    """
+
+    def __init__(self, X, n_lists=None, n_iter=10, seed=0):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if n_lists is None:
+            n_lists = int(np.clip(np.sqrt(len(X)), 1, 4096))
+        n_lists = max(1, min(n_lists, len(X)))
+        self.centroids = kmeans(X, n_lists, n_iter, seed=seed)
+        labels = _nearest_centroid(X, self.centroids)
+
+        self.ids = np.argsort(labels, kind="stable")
+        self.X = X[self.ids]
+        self.offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=self.offsets[1:])
+
+        self.lower = np.ones((n_lists, X.shape[1]), dtype=np.float32)
+        self.upper = np.zeros((n_lists, X.shape[1]), dtype=np.float32)
+        for i in range(n_lists):
+            block = self.X[self.offsets[i]:self.offsets[i + 1]]
+            if len(block):
+                self.lower[i] = block.min(axis=0)
+                self.upper[i] = block.max(axis=0)
+
+    def __len__(self):
+        return len(self.X)
+
+    def _scan(self, lists, t, w):
+        """Scores (same arithmetic as moodscore) and row ids of every track in lists."""
+        ids = np.concatenate([self.ids[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+        X = np.concatenate([self.X[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+        return score_matrix(X, t[None, :], w[None, :])[:, 0], ids
+
+    def search(self, target, k=10, nprobe=NPROBE, weights=None):
+        """Top k tracks closest to target; returns (row ids, mood scores), best first.
+
+        target is a {feature: value} dict (missing features are ignored, like a
+        mood_targets entry) or a full vector in numeric_features order. Ties are
+        broken by lower row id, matching moodscore + ranking.top_k.
+        """
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+        if isinstance(target, dict):
+            _, T, W = target_matrix({"target": target})
+            t, w = T[0], W[0]
+        else:
+            t = np.asarray(target, dtype=np.float32)
+            w = np.full(len(t), 1.0 / len(t), dtype=np.float32) if weights is None \
+                else np.asarray(weights, dtype=np.float32)
+
+        if nprobe is not None:
+            lists = np.argsort(np.abs(self.centroids - t) @ w, kind="stable")[:nprobe]
+            scores, ids = self._scan(lists, t, w)
+            return self._best(scores, ids, k)
+
+        # Exact: lower bound of 1 - score for each bucket from its bounding box
+        gap = np.maximum(self.lower - t, 0) + np.maximum(t - self.upper, 0)
+        bounds = gap @ w
+        order = np.argsort(bounds, kind="stable")
+        best_scores = np.empty(0, dtype=np.float64)
+        best_ids = np.empty(0, dtype=np.intp)
+        step = 8
+        for start in range(0, len(order), step):
+            lists = order[start:start + step]
+            if len(best_ids) == k and 1 - bounds[lists[0]] < best_scores[-1]:
+                break
+            scores, ids = self._scan(lists, t, w)
+            best_ids, best_scores = self._best(np.concatenate([best_scores, scores]),
+                                               np.concatenate([best_ids, ids]), k)
+        return best_ids, best_scores
+
+    @staticmethod
+    def _best(scores, ids, k):
+        """Top k of (scores, ids), ties broken by lower id (partial selection like ranking.top_k)."""
+        if len(scores) > k:
+            keep = scores >= np.partition(scores, len(scores) - k)[len(scores) - k]
+            scores, ids = scores[keep], ids[keep]
+        order = np.lexsort((ids, -scores))[:k]
+        return ids[order], scores[order]
+
+
+def recall(index, X, targets, k=10, nprobe=NPROBE):
+    """Fraction of the brute-force top k (moodscore + ranking) that index.search finds, per mood."""
+    moods, T, W = target_matrix(targets)
+    exact = score_matrix(X, T, W)
+    results = {}
+    for j, mood in enumerate(moods):
+        truth = top_k(exact[:, j], k)
+        found, _ = index.search(targets[mood], k, nprobe)
+        results[mood] = len(np.intersect1d(truth, found)) / len(truth)
+    return results
+
+
+if __name__ == "__main__":
+    import time
+
+    from moodscore import mood_targets
+
+    # Build on a synthetic catalog and compare latency/recall with brute force
+    rng = np.random.default_rng(0)
+    n = 2_000_000
+    X = rng.beta(2, 3, (n, len(numeric_features))).astype(np.float32)
+
+    start = time.perf_counter()
+    index = MoodIndex(X)
+    print(f"Built index over {n} tracks ({len(index.centroids)} lists) in {time.perf_counter() - start:.2f}s")
+
+    moods, T, W = target_matrix(mood_targets)
+    start = time.perf_counter()
+    for j in range(len(moods)):
+        top_k(score_matrix(X, T[j:j + 1], W[j:j + 1])[:, 0], 10)
+    print(f"Brute force: {(time.perf_counter() - start) / len(moods) * 1000:.1f}ms per query")
+
+    for nprobe in (None, 8, 32):
+        start = time.perf_counter()
+        for mood in moods:
+            index.search(mood_targets[mood], 10, nprobe)
+        elapsed = (time.perf_counter() - start) / len(moods) * 1000
+        hits = recall(index, X, mood_targets, 10, nprobe)
+        label = "exact" if nprobe is None else f"nprobe={nprobe}"
+        print(f"Index ({label}): {elapsed:.1f}ms per query, mean recall@10 {np.mean(list(hits.values())):.3f}")
+
+    # Ad-hoc target vector (not one of the mood_targets keys)
+    ids, scores = index.search(rng.random(len(numeric_features)), 5)
+    print("Ad-hoc query:", list(zip(ids.tolist(), np.round(scores, 3).tolist())))
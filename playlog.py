@@ -0,0 +1,285 @@
+# Play log
+# Streams StreamingHistory_music_*.json exports into a compact columnar store
+# (integer arrays + string dictionaries) and only ingests what it hasn't seen before
+
+import codecs
+import glob
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from stages import stage
+from trackdict import TrackDict
+
+PLAYLOG_DIR = ".playlog"
+BATCH_SIZE = 50_000
+CHUNK_SIZE = 1 << 16
+
+# Column name -> dtype of the raw column files
+COLUMNS = {
+    "end_time": np.int64,    # minutes since the Unix epoch
+    "artist_id": np.int32,
+    "track_id": np.int32,
+    "ms_played": np.int64,
+}
+
+
+def iter_records(path, offset=0, chunk_size=CHUNK_SIZE):
+    """Yield (record, end_offset) for each object of a JSON array file.
+
+    The file is read chunk_size bytes at a time starting from byte offset (0 or a
+    previous end_offset), so memory stays bounded no matter how big the export is.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        buf = ""
+        pos = 0            # parse position in buf
+        mark = 0           # end of the last record in buf
+        mark_offset = offset
+        eof = False
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n[,":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            if pos < len(buf):
+                try:
+                    record, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    mark_offset += len(buf[mark:end].encode("utf-8"))
+                    mark = pos = end
+                    yield record, mark_offset
+                    continue
+            elif eof:
+                return
+            # Need more data: drop what's already consumed and read the next chunk
+            buf, pos, mark = buf[mark:], pos - mark, 0
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf += utf8.decode(chunk, final=eof)
+
+
+def _file_key(path):
+    """Sort StreamingHistory_music_2.json before StreamingHistory_music_10.json."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(path))]
+
+
+def _prefix_hash(path, length):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while length > 0:
+            block = f.read(min(length, 1 << 20))
+            if not block:
+                break
+            digest.update(block)
+            length -= len(block)
+    return digest.hexdigest()
+
+
+def store_path(folder, root=PLAYLOG_DIR):
+    """<root>/<hash of the folder's absolute path>: every history folder has a store of its own."""
+    return os.path.join(root, hashlib.sha256(os.path.abspath(folder).encode("utf-8")).hexdigest()[:16])
+
+
+class PlayLog:
+    """Columnar store of every play ingested from one folder of streaming history exports."""
+
+    def __init__(self, folder="./streaminghistory", root=PLAYLOG_DIR):
+        self.folder = folder
+        self.path = store_path(folder, root)
+        self.manifest = self._read_manifest()
+        self.names = TrackDict(self._read_lines("artists.jsonl", self.manifest["artists"]),
+                               self._read_lines("tracks.jsonl", self.manifest["tracks"]))
+        self.artists = self.names.artists   # artist_id -> name
+        self.tracks = self.names.tracks     # track_id -> (artist_id, name)
+
+    @property
+    def rows(self):
+        return self.manifest["rows"]
+
+    @property
+    def version(self):
+        """Changes every time new plays are ingested (and when the store is rebuilt)."""
+        return f"{self.manifest['store_id']}-{self.manifest['version']}"
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_manifest(self):
+        try:
+            with open(self._file("manifest.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except OSError:
+            return {"store_id": os.urandom(4).hex(), "rows": 0, "version": 0, "artists": 0, "tracks": 0,
+                    "watermark": None, "files": {}}
+
+    def _write_manifest(self):
+        with open(self._file("manifest.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(self._file("manifest.json.tmp"), self._file("manifest.json"))
+
+    def _read_lines(self, name, count):
+        if not count:
+            return []
+        with open(self._file(name), "r", encoding="utf-8") as f:
+            return [tuple(v) if isinstance(v, list) else v
+                    for v, _ in zip(map(json.loads, f), range(count))]
+
+    def column(self, name):
+        """One column of the log as a NumPy array."""
+        if not self.rows:
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.fromfile(self._file(name + ".bin"), dtype=COLUMNS[name], count=self.rows)
+
+    def track_artist_ids(self):
+        """Artist id of every track id."""
+        return self.names.track_artist_ids()
+
+    def play_counts(self, weights=None):
+        """Plays per track id (or the sum of a column such as "ms_played"), one bincount."""
+        return self.names.counts(self.column("track_id"), None if weights is None else self.column(weights))
+
+    def _watermark_plays(self, watermark, rows):
+        """Plays among the first rows stored in the watermark minute (for de-duplicating new exports)."""
+        end_time = self.column("end_time")[:rows]
+        at = np.flatnonzero(end_time == watermark)
+        columns = [self.column(name)[at] for name in ("artist_id", "track_id", "ms_played")]
+        return set(zip(*(c.tolist() for c in columns)))
+
+    def _flush(self, batch):
+        """Append a batch of plays and any new dictionary entries to disk."""
+        columns = {name: np.asarray(values, dtype=COLUMNS[name]) for name, values in batch.items()
+                   if name != "end_time"}
+        columns["end_time"] = np.array(batch["end_time"], dtype="datetime64[m]").astype(np.int64)
+        for name, values in columns.items():
+            with open(self._file(name + ".bin"), "ab") as f:
+                values.tofile(f)
+        new_entries = (("artists.jsonl", self.artists[self.manifest["artists"]:]),
+                       ("tracks.jsonl", self.tracks[self.manifest["tracks"]:]))
+        for name, entries in new_entries:
+            with open(self._file(name), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        if len(columns["end_time"]):
+            self.manifest["watermark"] = max(self.manifest["watermark"] or 0, int(columns["end_time"].max()))
+        self.manifest["rows"] += len(columns["end_time"])
+        self.manifest["artists"] = len(self.artists)
+        self.manifest["tracks"] = len(self.tracks)
+        for values in batch.values():
+            values.clear()
+
+    def _truncate(self):
+        """Drop anything written after the last manifest (e.g. an interrupted ingest)."""
+        for name, dtype in COLUMNS.items():
+            path = self._file(name + ".bin")
+            if os.path.exists(path):
+                with open(path, "r+b") as f:
+                    f.truncate(self.rows * np.dtype(dtype).itemsize)
+        for name, count in (("artists.jsonl", self.manifest["artists"]), ("tracks.jsonl", self.manifest["tracks"])):
+            if os.path.exists(self._file(name)):
+                with open(self._file(name), "r", encoding="utf-8") as f:
+                    lines = [line for line, _ in zip(f, range(count))]
+                with open(self._file(name), "w", encoding="utf-8") as f:
+                    f.writelines(lines)
+
+    def ingest(self):
+        """Ingest new plays from every JSON export in the folder; returns how many were added.
+
+        Files are tracked by name within the folder. Files that only grew are
+        resumed from the byte offset where the last ingest stopped. New and
+        rewritten files (a fresh Spotify export, under the old names or new
+        ones) are read from the start, skipping plays at or before the newest
+        play stored before this ingest. Records without a track and artist name
+        (podcast episodes) are skipped.
+        """
+        with stage("ingest history") as s:
+            added = s.rows = self._ingest(self.folder)
+        return added
+
+    def _ingest(self, folder):
+        os.makedirs(self.path, exist_ok=True)
+        self._truncate()
+        start_rows = self.rows
+        watermark, seen = self.manifest["watermark"], None   # newest play stored before this ingest
+        batch = {name: [] for name in COLUMNS}
+
+        for file in sorted(glob.glob(os.path.join(folder, "*.json")), key=_file_key):
+            path, name = os.path.abspath(file), os.path.basename(file)
+            stat = os.stat(path)
+            state = self.manifest["files"].get(name)
+            if state and state["size"] == stat.st_size and state["mtime_ns"] == stat.st_mtime_ns:
+                continue
+            if state and stat.st_size >= state["offset"] and _prefix_hash(path, state["offset"]) == state["prefix_sha256"]:
+                offset, deduplicate = state["offset"], False
+            else:
+                offset, deduplicate = 0, watermark is not None
+                if deduplicate and seen is None:
+                    seen = self._watermark_plays(watermark, start_rows)
+
+            for record, end_offset in iter_records(path, offset):
+                offset = end_offset
+                artist = record.get("artistName")
+                track = record.get("trackName")
+                if not artist or not track:
+                    continue
+                end_time = record["endTime"]
+                artist_id, track_id = self.names.intern(artist, track)
+                if deduplicate:
+                    minute = int(np.datetime64(end_time, "m").astype(np.int64))
+                    if minute < watermark or (minute == watermark and (artist_id, track_id, record["msPlayed"]) in seen):
+                        continue
+                batch["end_time"].append(end_time)
+                batch["artist_id"].append(artist_id)
+                batch["track_id"].append(track_id)
+                batch["ms_played"].append(record["msPlayed"])
+                if len(batch["end_time"]) >= BATCH_SIZE:
+                    self._flush(batch)
+
+            self._flush(batch)
+            self.manifest["files"][name] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "offset": offset,
+                "prefix_sha256": _prefix_hash(path, offset),
+            }
+            self._write_manifest()
+
+        added = self.rows - start_rows
+        if added:
+            self.manifest["version"] += 1
+            self._write_manifest()
+        return added
+
+    def to_frame(self):
+        """The log as a DataFrame with the same columns as the JSON exports."""
+        import pandas as pd
+
+        track_id = self.column("track_id")
+        artist_names = pd.Categorical.from_codes(self.column("artist_id"), self.artists, validate=False) \
+            if self.artists else pd.Categorical([])
+        track_names = pd.Series([name for _, name in self.tracks], dtype=object)
+        return pd.DataFrame({
+            "endTime": self.column("end_time").astype("datetime64[m]"),
+            "artistName": artist_names,
+            "trackName": track_names.to_numpy()[track_id] if len(track_names) else track_names,
+            "msPlayed": self.column("ms_played"),
+        })
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # Ingest any new plays and report the size of the store
+    start = time.perf_counter()
+    log = PlayLog(sys.argv[1] if len(sys.argv) > 1 else "./streaminghistory")
+    added = log.ingest()
+    print(f"Ingested {added} new plays in {time.perf_counter() - start:.3f}s "
+          f"({log.rows} plays, {len(log.artists)} artists, {len(log.tracks)} tracks)")
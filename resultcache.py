@@ -0,0 +1,153 @@
+# Result cache
+# Memoizes recommendation results per (mood or target, k, scoring options, catalog version,
+# history version)
+# with LRU eviction in memory and an optional on-disk tier
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+FORMAT = 3   # bumped when the same data versions start producing different results (on-disk entries are dropped)
+
+
+def target_key(target):
+    """Stable key for a mood name, a {feature: value} dict or a target vector."""
+    if isinstance(target, str):
+        return "mood:" + target
+    if isinstance(target, dict):
+        data = json.dumps(sorted((f, float(v)) for f, v in target.items()))
+    else:
+        data = np.asarray(target, dtype=np.float32).tobytes().hex()
+    return "target:" + hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def scoring_options(affinity=False, rules=None):
+    """Tag of the scoring options, part of every cache key so results of different options never mix."""
+    options = "+affinity" if affinity else ""
+    if rules:
+        options += f"+rules:{os.path.abspath(rules)}:{os.stat(rules).st_mtime_ns}"
+    return options
+
+
+class ResultCache:
+    """LRU cache of JSON-serializable results, tagged with the data versions they came from.
+
+    Every key includes the scoring options and the current catalog and
+    history versions, and set_versions() drops entries from older versions
+    (memory and disk) as soon as the catalog or play log reports a change.
+    Results are only stored for the versions they were computed from. The disk tier keeps at
+    most max_disk_entries files, evicting the least recently used.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None, max_disk_entries=4096):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.versions = (None, None)
+        self.entries = OrderedDict()
+        self.disk_entries = OrderedDict()   # file name -> None, least recently used first
+        self.lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            names = [name for name in os.listdir(disk_dir) if name.endswith(".json")]
+            for name in sorted(names, key=lambda name: os.stat(os.path.join(disk_dir, name)).st_mtime_ns):
+                self.disk_entries[name] = None
+
+    def set_versions(self, catalog_version, history_version):
+        """Switch to new data versions, invalidating everything cached for other versions."""
+        versions = (catalog_version, history_version)
+        with self.lock:
+            if versions == self.versions:
+                return
+            self.versions = versions
+            self.entries.clear()
+            if self.disk_dir:
+                prefix = self._version_prefix()
+                for name in os.listdir(self.disk_dir):
+                    if not name.startswith(prefix):
+                        os.remove(os.path.join(self.disk_dir, name))
+                        self.disk_entries.pop(name, None)
+
+    def _version_prefix(self):
+        return hashlib.sha1(json.dumps([FORMAT, *self.versions]).encode("utf-8")).hexdigest()[:12] + "-"
+
+    def _key(self, target, k, options):
+        return (target_key(target), k, options) + self.versions
+
+    def _disk_path(self, key):
+        name = hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, self._version_prefix() + name + ".json")
+
+    def get(self, target, k, options=""):
+        """Cached result or None."""
+        with self.lock:
+            key = self._key(target, k, options)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            if self.disk_dir:
+                path = self._disk_path(key)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        value = json.load(f)
+                    os.utime(path)   # the disk tier's LRU order survives restarts as mtimes
+                except (OSError, ValueError):
+                    pass
+                else:
+                    self.disk_hits += 1
+                    self._touch(path)
+                    self._remember(key, value)
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, target, k, value, options="", versions=None):
+        """Cache value, unless it was computed from versions other than the current ones."""
+        with self.lock:
+            if versions is not None and tuple(versions) != self.versions:
+                return   # set_versions() ran while it was being computed
+            key = self._key(target, k, options)
+            self._remember(key, value)
+            if self.disk_dir:
+                path = self._disk_path(key)
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump(value, f, ensure_ascii=False)
+                os.replace(path + ".tmp", path)
+                self._touch(path)
+                while len(self.disk_entries) > self.max_disk_entries:
+                    name, _ = self.disk_entries.popitem(last=False)
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+
+    def _touch(self, path):
+        """Mark a disk entry most recently used."""
+        name = os.path.basename(path)
+        self.disk_entries[name] = None
+        self.disk_entries.move_to_end(name)
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get_or_compute(self, target, k, compute, options="", versions=None):
+        """Return the cached result, or compute(target, k) and cache it (see put for versions)."""
+        value = self.get(target, k, options)
+        if value is None:
+            value = compute(target, k)
+            self.put(target, k, value, options, versions)
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "disk_entries": len(self.disk_entries), "hits": self.hits,
+                    "disk_hits": self.disk_hits, "misses": self.misses}
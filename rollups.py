@@ -0,0 +1,186 @@
+# Listening rollups
+# Daily per-track play counts and listening time (plus plays per hour) pre-aggregated from the
+# play log and kept next to it, so top tracks/artists and per-day/per-hour questions over any
+# endTime window only touch the days in the window, not every play
+
+import os
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+FORMAT = 1
+
+
+def to_minute(when):
+    """Minutes since the epoch for "2024-03-01", "2024-03-01 17:42", a datetime or datetime64."""
+    if isinstance(when, (int, np.integer)):
+        return int(when)
+    return int(np.datetime64(when, "m").astype(np.int64))
+
+
+class Rollups:
+    """Pre-aggregated view of a PlayLog.
+
+    cell_*   one entry per (day, track) with plays and ms_played, sorted by day
+             (day_start[d] is where day first_day + d begins)
+    hourly_* plays and ms_played per (day, hour of day), dense
+    minute_* every play's end_time, track id and ms_played sorted by time, only
+             read for the partial days at the edges of a window
+    Windows are [start, end) in endTime minutes; None means unbounded.
+    """
+
+    ARRAYS = ("cell_day", "cell_track", "cell_plays", "cell_ms", "day_start", "hourly_plays", "hourly_ms",
+              "minute", "minute_track", "minute_ms")
+
+    def __init__(self, arrays, first_day, tracks, track_artist_ids):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.first_day = first_day
+        self.days = len(self.day_start) - 1
+        self.tracks = tracks
+        self.track_artist_ids = track_artist_ids
+
+    @classmethod
+    def build(cls, log):
+        """Aggregate every play of log (one sort and a few bincounts)."""
+        end_time = log.column("end_time")
+        order = np.argsort(end_time, kind="stable")
+        minute = end_time[order]
+        track = log.column("track_id")[order]
+        ms_played = log.column("ms_played")[order]
+        tracks = len(log.tracks)
+        first_day = int(minute[0] // MINUTES_PER_DAY) if len(minute) else 0
+        day = minute // MINUTES_PER_DAY - first_day
+        days = int(day[-1]) + 1 if len(day) else 0
+
+        cells, cell_of_play = np.unique(day * max(tracks, 1) + track, return_inverse=True)
+        cell_day = (cells // max(tracks, 1)).astype(np.int32)
+        hour = day * 24 + (minute % MINUTES_PER_DAY) // 60
+        arrays = {
+            "cell_day": cell_day,
+            "cell_track": (cells % max(tracks, 1)).astype(np.int32),
+            "cell_plays": np.bincount(cell_of_play, minlength=len(cells)).astype(np.int32),
+            "cell_ms": np.bincount(cell_of_play, weights=ms_played, minlength=len(cells)).astype(np.int64),
+            "day_start": np.searchsorted(cell_day, np.arange(days + 1)),
+            "hourly_plays": np.bincount(hour, minlength=days * 24).reshape(days, 24),
+            "hourly_ms": np.bincount(hour, weights=ms_played, minlength=days * 24).astype(np.int64).reshape(days, 24),
+            "minute": minute,
+            "minute_track": track,
+            "minute_ms": ms_played,
+        }
+        return cls(arrays, first_day, tracks, log.track_artist_ids())
+
+    @classmethod
+    def load(cls, log):
+        """Rollups of log, read from <log>/rollups.npz, or rebuilt (and saved) if the log changed."""
+        path = os.path.join(log.path, "rollups.npz")
+        try:
+            with np.load(path) as saved:
+                if int(saved["format"]) == FORMAT and str(saved["version"]) == log.version:
+                    return cls(saved, int(saved["first_day"]), len(log.tracks), log.track_artist_ids())
+        except (OSError, KeyError, ValueError):
+            pass
+        rollups = cls.build(log)
+        if os.path.isdir(log.path):
+            with open(path + ".tmp", "wb") as f:
+                np.savez(f, format=FORMAT, version=log.version, first_day=rollups.first_day,
+                         **{name: getattr(rollups, name) for name in cls.ARRAYS})
+            os.replace(path + ".tmp", path)
+        return rollups
+
+    def _split(self, start, end):
+        """(first full day, end full day, [(minute slice)] edges) of a window, days relative to first_day."""
+        lo = self.first_day * MINUTES_PER_DAY if start is None else to_minute(start)
+        hi = (self.first_day + self.days) * MINUTES_PER_DAY if end is None else to_minute(end)
+        d0 = min(max(-(-lo // MINUTES_PER_DAY) - self.first_day, 0), self.days)
+        d1 = min(max(hi // MINUTES_PER_DAY - self.first_day, d0), self.days)
+        if hi <= lo:
+            return 0, 0, []
+        day_lo = (self.first_day + d0) * MINUTES_PER_DAY
+        day_hi = (self.first_day + d1) * MINUTES_PER_DAY
+        if d0 == d1:
+            edges = [(lo, hi)]
+        else:
+            edges = [(lo, min(day_lo, hi)), (max(day_hi, lo), hi)]
+        slices = [slice(*np.searchsorted(self.minute, [a, b])) for a, b in edges if a < b]
+        return d0, d1, slices
+
+    def track_totals(self, start=None, end=None):
+        """(plays, ms_played) per track id in the window."""
+        d0, d1, edges = self._split(start, end)
+        cells = slice(self.day_start[d0], self.day_start[d1]) if self.days else slice(0, 0)
+        plays = np.bincount(self.cell_track[cells], weights=self.cell_plays[cells], minlength=self.tracks)
+        ms_played = np.bincount(self.cell_track[cells], weights=self.cell_ms[cells], minlength=self.tracks)
+        for edge in edges:
+            plays = plays + np.bincount(self.minute_track[edge], minlength=self.tracks)
+            ms_played = ms_played + np.bincount(self.minute_track[edge], weights=self.minute_ms[edge],
+                                                minlength=self.tracks)
+        return plays.astype(np.int64), ms_played.astype(np.int64)
+
+    def artist_totals(self, start=None, end=None):
+        """(plays, ms_played) per artist id in the window."""
+        plays, ms_played = self.track_totals(start, end)
+        artists = int(self.track_artist_ids.max()) + 1 if len(self.track_artist_ids) else 0
+        return (np.bincount(self.track_artist_ids, weights=plays, minlength=artists).astype(np.int64),
+                np.bincount(self.track_artist_ids, weights=ms_played, minlength=artists).astype(np.int64))
+
+    def per_day(self, start=None, end=None):
+        """(dates, plays, ms_played) for every day the window touches (datetime64[D] dates)."""
+        d0, d1, edges = self._split(start, end)
+        first, last = d0, d1
+        for edge in edges:
+            if edge.stop > edge.start:
+                first = min(first, int(self.minute[edge.start] // MINUTES_PER_DAY) - self.first_day)
+                last = max(last, int(self.minute[edge.stop - 1] // MINUTES_PER_DAY) - self.first_day + 1)
+        plays = np.zeros(last - first, dtype=np.int64)
+        ms_played = np.zeros(last - first, dtype=np.int64)
+        plays[d0 - first:d1 - first] = self.hourly_plays[d0:d1].sum(axis=1)
+        ms_played[d0 - first:d1 - first] = self.hourly_ms[d0:d1].sum(axis=1)
+        for edge in edges:
+            day = self.minute[edge] // MINUTES_PER_DAY - self.first_day - first
+            plays += np.bincount(day, minlength=len(plays))
+            ms_played += np.bincount(day, weights=self.minute_ms[edge], minlength=len(plays)).astype(np.int64)
+        dates = np.arange(self.first_day + first, self.first_day + last).astype("datetime64[D]")
+        return dates, plays, ms_played
+
+    def per_hour(self, start=None, end=None):
+        """(plays, ms_played) by hour of day (0-23, UTC like endTime) over the window."""
+        d0, d1, edges = self._split(start, end)
+        plays = self.hourly_plays[d0:d1].sum(axis=0).astype(np.int64)
+        ms_played = self.hourly_ms[d0:d1].sum(axis=0).astype(np.int64)
+        for edge in edges:
+            hour = (self.minute[edge] % MINUTES_PER_DAY) // 60
+            plays += np.bincount(hour, minlength=24)
+            ms_played += np.bincount(hour, weights=self.minute_ms[edge], minlength=24).astype(np.int64)
+        return plays, ms_played
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from playlog import PlayLog
+    from ranking import top_k
+
+    # Build the rollups, then time a few window queries against a full rescan of the log
+    log = PlayLog(sys.argv[1] if len(sys.argv) > 1 else "./streaminghistory")
+    log.ingest()
+    start = time.perf_counter()
+    rollups = Rollups.build(log)
+    print(f"{log.rows} plays -> {len(rollups.cell_day)} (day, track) cells over {rollups.days} days "
+          f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    end_time, track_id = log.column("end_time"), log.column("track_id")
+    first = rollups.first_day * MINUTES_PER_DAY
+    for lo, hi in ((None, None), (first + 90 * MINUTES_PER_DAY + 123, first + 200 * MINUTES_PER_DAY + 45)):
+        start = time.perf_counter()
+        plays, _ = rollups.track_totals(lo, hi)
+        query_time = time.perf_counter() - start
+        start = time.perf_counter()
+        keep = np.ones(len(end_time), dtype=bool)
+        if lo is not None:
+            keep = (end_time >= lo) & (end_time < hi)
+        scanned = np.bincount(track_id[keep], minlength=len(log.tracks))
+        scan_time = time.perf_counter() - start
+        print(f"window {lo}-{hi}: rollup {query_time * 1000:.2f}ms, rescan {scan_time * 1000:.2f}ms, "
+              f"same counts: {np.array_equal(plays, scanned)}, top: {log.names.label(top_k(plays, 1)[0])}")
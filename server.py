@@ -0,0 +1,240 @@
+# Recommendation server
+# Loads and filters the catalog once, then answers /recommend?mood=...&k=... over HTTP
+# from that warm state (python server.py --port 8000)
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from affinity import catalog_affinity
+from catalog import cached_manifest, catalog_version
+from fuzzyrules import RuleBase, score_rules
+from history import listened_catalog
+from moodscore import mood_targets, numeric_features, score_moods, with_affinity
+from playlog import PlayLog
+from ranking import top_k
+from resultcache import ResultCache, scoring_options
+from stages import stage
+
+MAX_K = 100
+
+
+class Recommender:
+    """Filtered catalog plus every mood's scores, computed once and shared by all requests."""
+
+    def __init__(self, df, targets=mood_targets, versions=(None, None), features=numeric_features, rules=None,
+                 options=""):
+        self.df = df.reset_index(drop=True)
+        self.targets = targets
+        self.versions = versions   # (catalog version, history version) the state was built from
+        self.options = options     # resultcache.scoring_options tag of how it scores
+        # A fuzzy rule base (see fuzzyrules.py) replaces the closeness score for the moods it defines;
+        # the closeness score then only breaks ties between equal rule scores
+        self._tiebreak = {}
+        with stage("score moods", rows=len(self.df)):
+            self.scores = score_moods(self.df, targets, features)
+            if rules is not None:
+                ruled = score_rules(self.df, rules)
+                ruled = ruled[ruled.columns.intersection(self.scores.columns)]
+                if "affinity" in features:
+                    # Affinity weighs as much as one audio feature, as it does in the closeness score
+                    weight = 1 / len(features)
+                    ruled = ruled * (1 - weight) + self.df[["affinity"]].to_numpy(dtype=np.float32) * weight
+                self._tiebreak = {mood: self.scores[mood].to_numpy() for mood in ruled.columns}
+                self.scores[ruled.columns] = ruled.astype(np.float32)
+        self._columns = {mood: self.scores[mood].to_numpy() for mood in targets}
+        self._fields = {name: self.df[column].to_numpy(dtype=object)
+                        for name, column in (("track_name", "track_name"), ("artists", "artists"),
+                                             ("genre", "genres"))}
+
+    def recommend(self, mood, k=10):
+        """Top k songs for mood as a list of dicts (best first)."""
+        positions = top_k(self._columns[mood], k, self._tiebreak.get(mood))
+        scores = self._columns[mood][positions].tolist()
+        fields = {name: values[positions].tolist() for name, values in self._fields.items()}
+        return [
+            {"track_name": name, "artists": artists, "genre": genre, "mood_score": round(score, 6)}
+            for name, artists, genre, score in zip(fields["track_name"], fields["artists"], fields["genre"], scores)
+        ]
+
+
+def load_recommender(history_folder="./streaminghistory", affinity=False, rules=None):
+    """The songs final.py scores: canonical catalog (see canonical.py) filtered to the play log.
+
+    With affinity, how much and how recently each song was played is blended
+    into every mood's score (see affinity.py). rules is a path to a fuzzy
+    rule base (see fuzzyrules.py) used instead of the closeness score; with
+    both, the affinity is blended into the rule scores.
+    """
+    log = PlayLog(history_folder)
+    log.ingest()
+    songs, df = listened_catalog(log)
+    versions = (catalog_version(), log.version)
+    targets, features = mood_targets, numeric_features
+    if affinity:
+        targets, features = with_affinity(mood_targets)
+        with stage("listening affinity", rows=len(df)):
+            df = df.assign(affinity=catalog_affinity(songs, df, log))
+    return Recommender(df, targets, versions, features, RuleBase.load(rules) if rules else None,
+                       scoring_options(affinity, rules))
+
+
+class Service:
+    """Current Recommender plus the result cache, reloaded when the data changes."""
+
+    def __init__(self, history_folder="./streaminghistory", cache=None, affinity=False, rules=None):
+        self.history_folder = history_folder
+        self.affinity = affinity
+        self.rules = rules
+        self.cache = cache or ResultCache()
+        self.lock = threading.Lock()
+        self.recommender = load_recommender(history_folder, affinity, rules)
+        self.cache.set_versions(*self.recommender.versions)
+
+    def refresh(self):
+        """Pick up new plays or a changed catalog; returns True if the state was rebuilt."""
+        cached_manifest()   # rebuilds the catalog cache if the CSV changed
+        log = PlayLog(self.history_folder)
+        log.ingest()
+        if ((catalog_version(), log.version) == self.recommender.versions
+                and scoring_options(self.affinity, self.rules) == self.recommender.options):
+            return False
+        recommender = load_recommender(self.history_folder, self.affinity, self.rules)
+        with self.lock:
+            self.recommender = recommender
+            self.cache.set_versions(*recommender.versions)
+        return True
+
+    def recommend(self, mood, k=10):
+        with self.lock:
+            recommender = self.recommender
+        return self.cache.get_or_compute(mood, k, recommender.recommend, recommender.options, recommender.versions)
+
+
+class Stats:
+    """Thread-safe request counters and latency samples for load testing."""
+
+    def __init__(self, window=10_000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.samples = deque(maxlen=window)   # (finished_at, seconds)
+
+    def record(self, seconds, ok):
+        with self.lock:
+            self.requests += 1
+            self.errors += not ok
+            self.samples.append((time.time(), seconds))
+
+    def snapshot(self):
+        with self.lock:
+            samples = list(self.samples)
+            requests, errors = self.requests, self.errors
+        now = time.time()
+        latencies = sorted(seconds for _, seconds in samples)
+        recent = sum(1 for finished, _ in samples if finished >= now - 60)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3) if latencies else None
+
+        return {
+            "uptime_s": round(now - self.started, 3),
+            "requests": requests,
+            "errors": errors,
+            "throughput_rps": round(requests / max(now - self.started, 1e-9), 3),
+            "last_minute_rps": round(recent / 60, 3),
+            "latency_ms": {"p50": percentile(0.5), "p90": percentile(0.9), "p99": percentile(0.99),
+                           "max": round(latencies[-1] * 1000, 3) if latencies else None},
+        }
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    service = None
+    stats = None
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        status = 200
+        if url.path == "/recommend":
+            mood = query.get("mood", [""])[0].lower().strip()
+            try:
+                k = int(query.get("k", ["10"])[0])
+            except ValueError:
+                k = -1
+            if mood not in mood_targets:
+                status, body = 400, {"error": f"unknown mood '{mood}'", "moods": sorted(mood_targets)}
+            elif not 1 <= k <= MAX_K:
+                status, body = 400, {"error": f"k must be between 1 and {MAX_K}"}
+            else:
+                body = {"mood": mood, "k": k, "tracks": self.service.recommend(mood, k)}
+        elif url.path == "/moods":
+            body = {"moods": sorted(mood_targets)}
+        elif url.path == "/stats":
+            body = dict(self.stats.snapshot(), cache=self.service.cache.stats())
+        else:
+            status, body = 404, {"error": "not found"}
+        self._send(status, body)
+        if url.path != "/stats":
+            self.stats.record(time.perf_counter() - start, status == 200)
+
+    def log_message(self, format, *args):
+        pass  # keep load tests quiet; /stats has the numbers
+
+
+def _refresh_loop(service, interval):
+    while True:
+        time.sleep(interval)
+        if service.refresh():
+            print(f"Reloaded: {len(service.recommender.df)} songs, versions {service.recommender.versions}")
+
+
+def serve(service, host="127.0.0.1", port=8000, refresh_interval=None):
+    """Serve requests (one thread per connection) until interrupted."""
+    handler = type("Handler", (RequestHandler,), {"service": service, "stats": Stats()})
+    server = ThreadingHTTPServer((host, port), handler)
+    if refresh_interval:
+        threading.Thread(target=_refresh_loop, args=(service, refresh_interval), daemon=True).start()
+    print(f"Serving {len(service.recommender.df)} songs on http://{host}:{port}/recommend?mood=happy&k=10")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fuzzy mood recommendation server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--history", default="./streaminghistory", help="folder of StreamingHistory JSON files")
+    parser.add_argument("--cache-size", type=int, default=256, help="results kept in memory")
+    parser.add_argument("--cache-dir", help="also keep results on disk in this folder")
+    parser.add_argument("--disk-cache-size", type=int, default=4096, help="results kept in --cache-dir")
+    parser.add_argument("--refresh", type=float, help="seconds between checks for new plays / catalog changes")
+    parser.add_argument("--affinity", action="store_true", help="blend play count / skips / recency into scores")
+    parser.add_argument("--rules", help="score moods with a fuzzy rule base instead (e.g. rules/moods.json)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cache = ResultCache(args.cache_size, args.cache_dir, args.disk_cache_size)
+    service = Service(args.history, cache, args.affinity, args.rules)
+    print(f"Loaded in {time.perf_counter() - start:.2f}s")
+    serve(service, args.host, args.port, args.refresh)
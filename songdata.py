@@ -2,6 +2,10 @@ import os
 import json
 from collections import Counter
 
+import numpy as np
+
+from trackdict import TrackDict
+
 def load_spotify_data(folder_path):
     """Load all Spotify JSON files from the given folder into a single list."""
     all_data = []
@@ -16,23 +20,40 @@ def load_spotify_data(folder_path):
                     print(f"Skipping invalid JSON: {file_name}")
     return all_data
 
+def play_counts(data):
+    """Intern every (artist, track) pair once and count plays per track id, ignoring 'Unknown'.
+
+    Returns the TrackDict and an array of play counts indexed by its track ids.
+    """
+    songs = TrackDict()
+    pairs = ((entry.get("artistName", ""), entry.get("trackName", "")) for entry in data)
+    track_ids = songs.intern_many(pairs, len(data), normalize=lambda name: str(name or "").strip())
+    return songs, _drop_unknown(songs, songs.counts(track_ids))
+
+def playlog_counts(log):
+    """play_counts for an ingested PlayLog (see playlog.py), without re-reading the JSON files."""
+    songs = TrackDict()
+    pairs = ((log.artists[artist_id], track) for artist_id, track in log.tracks)
+    remap = songs.intern_many(pairs, len(log.tracks), normalize=lambda name: str(name or "").strip())
+    return songs, _drop_unknown(songs, songs.counts(remap[log.column("track_id")]))
+
+def _drop_unknown(songs, counts):
+    # skip unknowns (checked once per distinct song, not per play)
+    unknown = np.array([songs.artists[artist_id].lower() == "unknown artist" or track.lower() == "unknown track"
+                        for artist_id, track in songs.tracks], dtype=bool)
+    counts[unknown] = 0
+    return counts
+
 def count_song_plays(data):
     """Count how many times each (artist, track) pair appears, ignoring 'Unknown'."""
+    songs, counts = play_counts(data)
     counter = Counter()
-    for entry in data:
-        artist = entry.get("artistName", "").strip()
-        track = entry.get("trackName", "").strip()
-
-        # skip unknowns
-        if artist.lower() == "unknown artist" or track.lower() == "unknown track":
-            continue  
-
-        song_key = f"{artist} - {track}"
-        counter[song_key] += 1
+    for track_id in np.flatnonzero(counts):
+        counter[songs.label(track_id)] += int(counts[track_id])
     return counter
 
 if __name__ == "__main__":
     folder_path = "streaminghistory"
     data = load_spotify_data(folder_path)
-    counter = count_song_plays(data)
-    print(len(counter)) 
+    songs, counts = play_counts(data)
+    print(np.count_nonzero(counts))
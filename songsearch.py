@@ -0,0 +1,163 @@
+# Song search
+# Fuzzy title/artist lookup through a trigram inverted index, built once per catalog
+# version and stored next to the catalog cache
+
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+from catalog import CACHE_DIR, catalog_version
+
+FORMAT = 2
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation, and drop bracketed extras like "(Remastered)".
+
+    Only combining marks are dropped, so non-Latin titles keep their letters.
+    """
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"\([^)]*\)|\[[^\]]*\]", " ", text)
+    text = re.sub(r"\s+-\s+.*$", " ", text)          # "Song - 2011 Remaster"
+    text = text.replace("&", " and ")
+    return " ".join(re.sub(r"[^\w ]+|_", " ", text.replace("'", "")).split())
+
+
+def trigrams(text):
+    """Set of character trigrams of a normalized string, padded so word starts count."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _pack(strings):
+    """Normalized strings (never containing NUL) as one uint8 array."""
+    return np.frombuffer("\0".join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+def _unpack(array):
+    return array.tobytes().decode("utf-8").split("\0")
+
+
+class _TrigramTable:
+    """Inverted index from trigram to the ids of the strings that contain it."""
+
+    def __init__(self, strings, vocab):
+        # Empty strings get no trigrams (size 0), so they never match anything
+        pairs = [(vocab.setdefault(gram, len(vocab)), i) for i, s in enumerate(strings) if s for gram in trigrams(s)]
+        grams, ids = np.array(pairs, dtype=np.int64).reshape(-1, 2).T if pairs else (np.empty(0, np.int64),) * 2
+        order = np.argsort(grams, kind="stable")
+        self.ids = ids[order].astype(np.int32)
+        self.grams = grams[order]
+        self.sizes = np.array([len(trigrams(s)) if s else 0 for s in strings], dtype=np.int32)
+
+    @classmethod
+    def from_arrays(cls, ids, grams, sizes):
+        table = cls.__new__(cls)
+        table.ids, table.grams, table.sizes = ids, grams, sizes
+        return table
+
+    def similarity(self, query, vocab):
+        """Dice coefficient between query and every indexed string (0 when nothing is shared or query is empty)."""
+        grams = [vocab[g] for g in trigrams(query) if g in vocab] if query else []
+        if not grams:
+            return np.zeros(len(self.sizes), dtype=np.float32)
+        grams = np.array(grams, dtype=np.int64)
+        starts = np.searchsorted(self.grams, grams, side="left")
+        ends = np.searchsorted(self.grams, grams, side="right")
+        hits = np.concatenate([self.ids[a:b] for a, b in zip(starts, ends)])
+        shared = np.bincount(hits, minlength=len(self.sizes))
+        return (2 * shared / (len(trigrams(query)) + self.sizes)).astype(np.float32)
+
+
+class SongIndex:
+    """Trigram index over normalized track titles and individual artist names."""
+
+    def __init__(self, titles, title_ids, artists, artist_ids, artist_offsets, vocab, title_table, artist_table):
+        self.titles = titles                  # unique normalized titles
+        self.title_ids = title_ids            # row -> title id
+        self.artists = artists                # unique normalized artist names
+        self.artist_ids = artist_ids          # flattened row -> artist ids
+        self.artist_offsets = artist_offsets  # row i owns artist_ids[offsets[i]:offsets[i + 1]]
+        self.vocab = vocab
+        self.title_table = title_table
+        self.artist_table = artist_table
+
+    @classmethod
+    def build(cls, df):
+        """Index the track_name and artists columns of a catalog DataFrame."""
+        import pandas as pd
+
+        title_ids, titles = pd.factorize(df["track_name"].fillna("").map(normalize))
+        row_artists = df["artists"].fillna("").astype(str).str.split(";")
+        counts = row_artists.str.len().to_numpy()
+        flat = pd.Series([a for names in row_artists for a in names], dtype=object).map(normalize)
+        artist_ids, artists = pd.factorize(flat)
+        offsets = np.zeros(len(df) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        vocab = {}
+        titles, artists = list(titles), list(artists)
+        return cls(titles, title_ids.astype(np.int32), artists, artist_ids.astype(np.int32), offsets, vocab,
+                   _TrigramTable(titles, vocab), _TrigramTable(artists, vocab))
+
+    def save(self, path):
+        """Write the index as one .npz file (string lists as NUL-joined UTF-8, no pickling)."""
+        arrays = {"format": np.array(FORMAT), "titles": _pack(self.titles), "title_ids": self.title_ids,
+                  "artists": _pack(self.artists), "artist_ids": self.artist_ids,
+                  "artist_offsets": self.artist_offsets, "vocab": _pack(sorted(self.vocab, key=self.vocab.get))}
+        for name, table in (("title", self.title_table), ("artist", self.artist_table)):
+            arrays.update({f"{name}_postings": table.ids, f"{name}_grams": table.grams,
+                           f"{name}_sizes": table.sizes})
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        if int(data["format"]) != FORMAT:
+            raise ValueError(f"{path}: unsupported song index format")
+        vocab = {gram: i for i, gram in enumerate(_unpack(data["vocab"]))}
+        tables = [_TrigramTable.from_arrays(data[f"{name}_postings"], data[f"{name}_grams"], data[f"{name}_sizes"])
+                  for name in ("title", "artist")]
+        return cls(_unpack(data["titles"]), data["title_ids"], _unpack(data["artists"]), data["artist_ids"],
+                   data["artist_offsets"], vocab, *tables)
+
+    def search(self, title, artist=None, k=10, min_score=0.5):
+        """Best matching catalog rows for a title (and optionally artist).
+
+        Returns [(row position, score)] best first. The score blends title
+        similarity with the best similarity among the row's listed artists.
+        """
+        row_scores = self.title_table.similarity(normalize(title), self.vocab)[self.title_ids]
+        if artist:
+            artist_scores = self.artist_table.similarity(normalize(artist), self.vocab)
+            per_row = np.maximum.reduceat(artist_scores[self.artist_ids], self.artist_offsets[:-1])
+            row_scores = 0.65 * row_scores + 0.35 * per_row
+        candidates = np.flatnonzero(row_scores >= min_score)
+        order = np.lexsort((candidates, -row_scores[candidates]))[:k]
+        return [(int(i), float(row_scores[i])) for i in candidates[order]]
+
+
+def load_index(df=None, cache_dir=CACHE_DIR):
+    """Song index for the cached catalog, rebuilt only when the catalog version changes.
+
+    df (the cached catalog) is only needed to build the index; without it the
+    catalog is loaded on a cache miss.
+    """
+    path = os.path.join(cache_dir, f"songsearch-{catalog_version(cache_dir)}.npz")
+    if os.path.exists(path):
+        try:
+            return SongIndex.load(path)
+        except (OSError, ValueError, KeyError):
+            pass
+    if df is None:
+        from catalog import load_catalog
+
+        df = load_catalog(cache_dir=cache_dir)
+    index = SongIndex.build(df)
+    index.save(path)
+    return index
@@ -0,0 +1,219 @@
+# Spotify Web API client
+# asyncio front end over one pooled requests.Session: cached client-credentials token,
+# bounded concurrency and 429 / Retry-After backoff, for resolving many artists/tracks at once
+
+import asyncio
+import base64
+import email.utils
+import math
+import random
+import time
+
+from requests import ConnectionError, Session, Timeout
+from requests.adapters import HTTPAdapter
+
+from apicache import TTL, OfflineMiss
+
+API_URL = "https://api.spotify.com/v1"
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+
+def retry_after(value, default=1.0):
+    """Seconds to wait for a Retry-After header: delta seconds or an HTTP date, default if unparseable."""
+    if value is None:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(0.0, seconds) if math.isfinite(seconds) else default
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        return default
+    return max(0.0, when.timestamp() - time.time())
+
+
+class SpotifyError(Exception):
+    """A request that still failed after all retries."""
+
+    def __init__(self, status, url, body=""):
+        super().__init__(f"{status} from {url}: {body[:200]}")
+        self.status = status
+
+
+class SpotifyClient:
+    """Pooled, rate-limit-aware Spotify client.
+
+    api_url and token_url can point at a local stand-in server that replays
+    canned responses. With an ApiCache, GET responses are served from it while
+    fresh (and only from it when the cache is offline).
+    """
+
+    def __init__(self, client_id, client_secret, concurrency=8, max_retries=5,
+                 api_url=API_URL, token_url=TOKEN_URL, refresh_margin=60, cache=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_url = api_url.rstrip("/")
+        self.token_url = token_url
+        self.max_retries = max_retries
+        self.refresh_margin = refresh_margin
+        self.cache = cache
+        self.session = Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._token_lock = asyncio.Lock()
+        self._token = None
+        self._token_expires = 0.0
+        self._paused_until = 0.0   # set by a 429, honoured by every request
+        self.requests = 0
+        self.rate_limited = 0
+        self.failed = 0   # lookups resolve_* gave up on
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    async def token(self):
+        """Client-credentials token, reused until refresh_margin seconds before it expires."""
+        async with self._token_lock:
+            if self._token is None or time.monotonic() >= self._token_expires - self.refresh_margin:
+                auth = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode("utf-8")).decode("utf-8")
+                response = await self._send("POST", self.token_url, headers={"Authorization": "Basic " + auth},
+                                            data={"grant_type": "client_credentials"})
+                self._token = response["access_token"]
+                self._token_expires = time.monotonic() + response.get("expires_in", 3600)
+            return self._token
+
+    async def _send(self, method, url, authorized=False, headers=None, **kwargs):
+        """Send one request with retries; returns the decoded JSON body.
+
+        429s wait for Retry-After; 5xx responses, dropped connections and
+        timeouts back off exponentially.
+        """
+        for attempt in range(self.max_retries + 1):
+            wait = self._paused_until - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            request_headers = dict(headers or {})
+            if authorized:
+                request_headers["Authorization"] = "Bearer " + await self.token()
+            async with self._slots:
+                self.requests += 1
+                try:
+                    response = await asyncio.to_thread(self.session.request, method, url, headers=request_headers,
+                                                       timeout=30, **kwargs)
+                except (ConnectionError, Timeout) as error:
+                    if attempt == self.max_retries:
+                        raise SpotifyError(None, url, str(error)) from error
+                    response = None
+            if response is None:
+                await asyncio.sleep(self._backoff(attempt))
+            elif response.status_code == 429:
+                self.rate_limited += 1
+                delay = retry_after(response.headers.get("Retry-After"))
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            elif response.status_code == 401 and authorized:
+                self._token = None   # expired or revoked, fetch a new one
+            elif response.status_code >= 500:
+                await asyncio.sleep(self._backoff(attempt))
+            elif response.ok:
+                return response.json()
+            else:
+                break
+        raise SpotifyError(response.status_code, url, response.text)
+
+    @staticmethod
+    def _backoff(attempt):
+        """Seconds before retry number attempt + 1: exponential with jitter, at most 30s (+50%)."""
+        return min(30, 0.5 * 2 ** attempt) * (0.5 + random.random())
+
+    async def get(self, path, params=None, ttl=TTL["default"]):
+        if self.cache is None:
+            return await self._send("GET", self.api_url + path, authorized=True, params=params)
+        key = self.cache.key(path, params)
+        result = await asyncio.to_thread(self.cache.get, key)   # raises OfflineMiss when offline and not cached
+        if result is None:
+            result = await self._send("GET", self.api_url + path, authorized=True, params=params)
+            await asyncio.to_thread(self.cache.put, key, result, ttl)
+        return result
+
+    async def search_artist(self, artist_name):
+        """Best matching artist object, or None."""
+        result = await self.get("/search", {"q": artist_name, "type": "artist", "limit": 1}, TTL["search"])
+        items = result["artists"]["items"]
+        return items[0] if items else None
+
+    async def search_track(self, track_name, artist_name):
+        """Best matching track object for a (track, artist) pair, or None."""
+        result = await self.get("/search", {"q": f"track:{track_name} artist:{artist_name}",
+                                            "type": "track", "limit": 1}, TTL["search"])
+        items = result["tracks"]["items"]
+        return items[0] if items else None
+
+    async def top_tracks(self, artist_id, country="US"):
+        result = await self.get(f"/artists/{artist_id}/top-tracks", {"country": country}, TTL["top-tracks"])
+        return result["tracks"]
+
+    async def resolve_artists(self, artist_names):
+        """{artist name: Spotify artist id or None}, looked up concurrently.
+
+        A name whose lookup failed (SpotifyError, OfflineMiss) maps to None;
+        the other results are kept. self.failed counts them.
+        """
+        names = list(dict.fromkeys(artist_names))
+        found = await self._gather(self.search_artist(name) for name in names)
+        return {name: item["id"] if item else None for name, item in zip(names, found)}
+
+    async def resolve_tracks(self, pairs):
+        """{(track, artist): Spotify track id or None}, looked up concurrently (failures map to None)."""
+        pairs = list(dict.fromkeys(pairs))
+        found = await self._gather(self.search_track(track, artist) for track, artist in pairs)
+        return {pair: item["id"] if item else None for pair, item in zip(pairs, found)}
+
+    async def _gather(self, lookups):
+        """Results of concurrent lookups, None for the ones that raised SpotifyError or OfflineMiss."""
+        found = await asyncio.gather(*lookups, return_exceptions=True)
+        for i, item in enumerate(found):
+            if isinstance(item, (SpotifyError, OfflineMiss)):
+                found[i] = None
+                self.failed += 1
+            elif isinstance(item, BaseException):
+                raise item
+        return found
+
+
+if __name__ == "__main__":
+    import os
+
+    import sys
+
+    from dotenv import load_dotenv
+
+    from apicache import ApiCache
+    from playlog import PlayLog
+
+    # Resolve every artist in the streaming history to a Spotify id (--offline: cache only)
+    async def main():
+        load_dotenv()
+        log = PlayLog("./streaminghistory")
+        log.ingest()
+        cache = ApiCache(offline="--offline" in sys.argv)
+        async with SpotifyClient(os.getenv("CLIENT_ID"), os.getenv("CLIENT_SECRET"), cache=cache) as client:
+            start = time.perf_counter()
+            ids = await client.resolve_artists(log.artists)
+            print(f"Resolved {sum(v is not None for v in ids.values())}/{len(ids)} artists with "
+                  f"{client.requests} requests ({client.rate_limited} rate limited, {client.failed} failed) "
+                  f"in {time.perf_counter() - start:.1f}s")
+
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+# Spotify replay server
+# Local stand-in for the Spotify accounts and Web API that replays canned responses from
+# replays/spotify.json (429s, 5xx, expired tokens), to exercise spotifyclient.py offline
+#   python spotifyreplay.py
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+FIXTURE = "replays/spotify.json"
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    replay = None
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        path = urlparse(self.path).path
+        response = self.replay.next_response(self.command, path, self.headers.get("Authorization"))
+        data = json.dumps(response.get("body", {})).encode("utf-8")
+        self.send_response(response["status"])
+        for name, value in response.get("headers", {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass  # the replay keeps its own log
+
+
+class ReplayServer:
+    """Serves the responses of a fixture in order, per "METHOD /path" (the last one repeats).
+
+    Every request is logged as (method, path, Authorization header, status);
+    unknown routes answer 404. Use as a context manager: it listens on a free
+    port of 127.0.0.1 in a background thread.
+    """
+
+    def __init__(self, fixture=FIXTURE):
+        with open(fixture, "r", encoding="utf-8") as f:
+            self.routes = {route: list(responses) for route, responses in json.load(f).items()}
+        self.log = []
+        self.lock = threading.Lock()
+        handler = type("Handler", (ReplayHandler,), {"replay": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def next_response(self, method, path, authorization=None):
+        with self.lock:
+            responses = self.routes.get(f"{method} {path}")
+            if not responses:
+                response = {"status": 404, "body": {"error": {"status": 404, "message": "no replay for " + path}}}
+            else:
+                response = responses.pop(0) if len(responses) > 1 else responses[0]
+            self.log.append((method, path, authorization, response["status"]))
+            return response
+
+    def requests(self, path):
+        """[(Authorization header, status)] of every request to path, in order."""
+        with self.lock:
+            return [(authorization, status) for _, logged, authorization, status in self.log if logged == path]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    import asyncio
+    import socket
+    import sys
+    import time
+
+    from spotifyclient import SpotifyClient
+
+    # Resolve one artist and its top tracks through rate limits, a 503 and an expired token
+    async def main(replay):
+        async with SpotifyClient("client-id", "client-secret", api_url=replay.url + "/v1",
+                                 token_url=replay.url + "/api/token", refresh_margin=0) as client:
+            start = time.perf_counter()
+            artist = await client.search_artist("COIN")
+            tracks = await client.top_tracks(artist["id"])
+            print(f"{artist['name']}: {', '.join(track['name'] for track in tracks)} "
+                  f"({client.requests} requests, {client.rate_limited} rate limited, "
+                  f"{time.perf_counter() - start:.1f}s)")
+            return client.rate_limited
+
+    # Resolve against an API that refuses connections: retried, then mapped to None
+    async def unreachable(replay):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            closed_url = f"http://127.0.0.1:{s.getsockname()[1]}/v1"
+        async with SpotifyClient("client-id", "client-secret", max_retries=1, api_url=closed_url,
+                                 token_url=replay.url + "/api/token") as client:
+            ids = await client.resolve_artists(["COIN"])
+            return ids, client.requests, client.failed
+
+    with ReplayServer() as replay:
+        rate_limited = asyncio.run(main(replay))
+        ids, requests, failed = asyncio.run(unreachable(replay))
+        checks = {
+            "429 (seconds, HTTP date, unparseable) and 503 retried":
+                [status for _, status in replay.requests("/v1/search")] == [429, 503, 429, 429, 200]
+                and rate_limited == 3,
+            "expired token refreshed before the next request":
+                replay.requests("/v1/artists/0ZxZlO7oWCSYMXhehpyMvE/top-tracks")[0][0] == "Bearer token-2",
+            "401 fetches a new token and retries":
+                replay.requests("/v1/artists/0ZxZlO7oWCSYMXhehpyMvE/top-tracks")[1:] == [("Bearer token-3", 200)],
+            "refused connection retried, then resolved to None":
+                ids == {"COIN": None} and requests == 3 and failed == 1,
+        }
+    for name, ok in checks.items():
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    sys.exit(0 if all(checks.values()) else 1)
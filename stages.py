@@ -0,0 +1,194 @@
+# Stage instrumentation
+# Wall time, CPU time, peak RSS and row counts per named pipeline stage. Off unless enabled,
+# either in code (stages.enable()) or from the environment:
+#   RECOMMENDER_STAGES=table python final.py            summary table on stderr at exit
+#   RECOMMENDER_STAGES=run.json python final.py          JSON records written to run.json
+#   RECOMMENDER_PROFILE="score moods:cprofile" ...        also profile one stage (or :tracemalloc)
+
+import atexit
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+ENV = "RECOMMENDER_STAGES"
+PROFILE_ENV = "RECOMMENDER_PROFILE"
+
+
+def peak_rss_mb():
+    """Process high-water resident memory in MB (None where the platform can't tell)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024   # bytes on macOS, KB elsewhere
+
+
+class Stage:
+    """Measurements of one stage; set .rows inside the with-block to record a row count."""
+
+    __slots__ = ("name", "depth", "rows", "wall_s", "cpu_s", "peak_rss_mb", "peak_growth_mb")
+
+    def __init__(self, name=None, depth=0, rows=None):
+        self.name = name
+        self.depth = depth
+        self.rows = rows
+        self.wall_s = self.cpu_s = self.peak_rss_mb = self.peak_growth_mb = None
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _NullStage:
+    """What stage() hands out while instrumentation is off: accepts .rows, records nothing."""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL = _NullStage()
+
+
+class Recorder:
+    """Collects Stage records in the order stages start (nested stages are indented)."""
+
+    def __init__(self, profile=None):
+        self.stages = []
+        self.depth = 0
+        self.profile = profile   # (stage name, "cprofile" | "tracemalloc") or None
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        record = Stage(name, self.depth, rows)
+        self.stages.append(record)
+        profiler = self._start_profile(name)
+        peak = peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        self.depth += 1
+        try:
+            yield record
+        finally:
+            self.depth -= 1
+            record.wall_s = time.perf_counter() - wall
+            record.cpu_s = time.process_time() - cpu
+            record.peak_rss_mb = peak_rss_mb()
+            if peak is not None:
+                record.peak_growth_mb = record.peak_rss_mb - peak
+            if profiler is not None:
+                self._finish_profile(name, profiler)
+
+    def _start_profile(self, name):
+        if not self.profile or self.profile[0] != name:
+            return None
+        if self.profile[1] == "tracemalloc":
+            import tracemalloc
+
+            tracemalloc.start()
+            return tracemalloc
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _finish_profile(self, name, profiler):
+        slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+        if self.profile[1] == "tracemalloc":
+            snapshot = profiler.take_snapshot()
+            _, peak = profiler.get_traced_memory()
+            profiler.stop()
+            print(f"\ntracemalloc for stage '{name}' (peak {peak / (1 << 20):.1f} MB traced):", file=sys.stderr)
+            for line in snapshot.statistics("lineno")[:15]:
+                print(f"  {line}", file=sys.stderr)
+            return
+        import pstats
+
+        profiler.disable()
+        path = f"stage-{slug}.prof"
+        profiler.dump_stats(path)
+        print(f"\ncProfile for stage '{name}' (full profile in {path}):", file=sys.stderr)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+
+    def records(self):
+        return [record.as_dict() for record in self.stages]
+
+    def table(self):
+        """The records as an aligned text table."""
+        width = max([len("  " * r.depth + r.name) for r in self.stages] + [5])
+        lines = [f"{'stage':<{width}}  {'wall s':>8}  {'cpu s':>8}  {'peak MB':>8}  {'+MB':>7}  {'rows':>9}"]
+        for r in self.stages:
+            cells = [_cell(r.wall_s, 8, ".3f"), _cell(r.cpu_s, 8, ".3f"), _cell(r.peak_rss_mb, 8, ".1f"),
+                     _cell(r.peak_growth_mb, 7, ".1f"), _cell(r.rows, 9, "d")]
+            lines.append(f"{'  ' * r.depth + r.name:<{width}}  " + "  ".join(cells))
+        return "\n".join(lines)
+
+    def report(self, output="table", file=None):
+        """Print the table ("table"), JSON ("json"), or write JSON to a path ending in .json."""
+        if output.endswith(".json") and output != "json":
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(self.records(), f, indent=2)
+        elif output == "json":
+            print(json.dumps(self.records(), indent=2), file=file or sys.stderr)
+        else:
+            print("\n" + self.table(), file=file or sys.stderr)
+
+
+def _cell(value, width, spec):
+    return format(value, f">{width}{spec}") if value is not None else "-".rjust(width)
+
+
+_recorder = None
+
+
+def enable(profile=None):
+    """Start recording stages (profile: optional (stage name, "cprofile" | "tracemalloc"))."""
+    global _recorder
+    _recorder = Recorder(profile)
+    return _recorder
+
+
+def disable():
+    """Stop recording and return the Recorder that was active (None if there was none)."""
+    global _recorder
+    active, _recorder = _recorder, None
+    return active
+
+
+def recorder():
+    """The active Recorder, or None while instrumentation is off."""
+    return _recorder
+
+
+def stage(name, rows=None):
+    """Context manager measuring one named stage; a shared no-op while instrumentation is off."""
+    if _recorder is None:
+        return _NULL
+    return _recorder.stage(name, rows)
+
+
+def _enable_from_environment():
+    output = os.environ.get(ENV)
+    if not output:
+        return
+    profile = os.environ.get(PROFILE_ENV)
+    if profile:
+        name, _, kind = profile.rpartition(":")
+        profile = (name, kind) if kind in ("cprofile", "tracemalloc") else (profile, "cprofile")
+    atexit.register(enable(profile).report, output)
+
+
+_enable_from_environment()
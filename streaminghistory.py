@@ -0,0 +1,111 @@
+# Streaming history charts
+# Top n songs / artists, plays per day and plays per hour of day over any endTime window,
+# answered from the play log's rollups (see rollups.py) and drawn with matplotlib
+#   python streaminghistory.py tracks --n 10 --since 2024-06-01 --until 2024-09-01
+#   python streaminghistory.py artists --by hours --out artists.png
+#   python streaminghistory.py days | hours
+
+import argparse
+
+import numpy as np
+
+from playlog import PlayLog
+from ranking import top_k
+from rollups import Rollups
+
+
+def top_tracks(log, rollups, n=10, start=None, end=None, by="plays"):
+    """[(label, plays, hours)] of the n most played tracks in the window ("Unknown" ones skipped)."""
+    plays, ms_played = rollups.track_totals(start, end)
+    known = np.array([log.artists[artist_id].lower() != "unknown artist" and track.lower() != "unknown track"
+                      for artist_id, track in log.tracks], dtype=bool)
+    return _top(log.names.label, plays, ms_played, known, n, by)
+
+
+def top_artists(log, rollups, n=10, start=None, end=None, by="plays"):
+    """[(artist, plays, hours)] of the n most played artists in the window."""
+    plays, ms_played = rollups.artist_totals(start, end)
+    known = np.array([name.lower() != "unknown artist" for name in log.artists[:len(plays)]], dtype=bool)
+    return _top(log.artists.__getitem__, plays, ms_played, known, n, by)
+
+
+def _top(label, plays, ms_played, known, n, by):
+    weight = np.where(known, plays if by == "plays" else ms_played, 0)
+    return [(label(i), int(plays[i]), ms_played[i] / 3_600_000) for i in top_k(weight, n) if weight[i] > 0]
+
+
+def plot_top(rows, title, by="plays", ax=None):
+    """Horizontal bar chart of top_tracks / top_artists rows, most played on top."""
+    import matplotlib.pyplot as plt
+
+    ax = ax or plt.subplots(figsize=(10, 0.4 * max(len(rows), 1) + 1.5))[1]
+    values = [plays if by == "plays" else hours for _, plays, hours in rows]
+    ax.barh([label for label, _, _ in rows][::-1], values[::-1])
+    ax.set_xlabel("Plays" if by == "plays" else "Hours listened")
+    ax.set_title(title)
+    return ax
+
+
+def plot_days(dates, plays, ms_played, by="plays", ax=None):
+    """Plays (or hours) per day."""
+    import matplotlib.pyplot as plt
+
+    ax = ax or plt.subplots(figsize=(12, 4))[1]
+    ax.bar(dates.astype("datetime64[D]").astype(object), plays if by == "plays" else ms_played / 3_600_000, width=1)
+    ax.set_ylabel("Plays" if by == "plays" else "Hours listened")
+    ax.set_title("Listening per day")
+    return ax
+
+
+def plot_hours(plays, ms_played, by="plays", ax=None):
+    """Plays (or hours) by hour of day (UTC, like endTime)."""
+    import matplotlib.pyplot as plt
+
+    ax = ax or plt.subplots(figsize=(8, 4))[1]
+    ax.bar(np.arange(24), plays if by == "plays" else ms_played / 3_600_000)
+    ax.set_xticks(range(0, 24, 2))
+    ax.set_xlabel("Hour of day (UTC)")
+    ax.set_ylabel("Plays" if by == "plays" else "Hours listened")
+    ax.set_title("Listening by hour of day")
+    return ax
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Charts of your streaming history")
+    parser.add_argument("chart", choices=["tracks", "artists", "days", "hours"])
+    parser.add_argument("--history", default="./streaminghistory", help="folder of StreamingHistory JSON files")
+    parser.add_argument("--n", type=int, default=10, help="how many tracks / artists")
+    parser.add_argument("--since", help="first endTime to count, e.g. 2024-06-01 or '2024-06-01 18:00'")
+    parser.add_argument("--until", help="count plays before this endTime")
+    parser.add_argument("--by", choices=["plays", "hours"], default="plays")
+    parser.add_argument("--out", help="save the chart to this file instead of showing it")
+    args = parser.parse_args(argv)
+
+    log = PlayLog(args.history)
+    log.ingest()
+    rollups = Rollups.load(log)
+    window = f" ({args.since or 'start'} to {args.until or 'now'})" if args.since or args.until else ""
+    if args.chart in ("tracks", "artists"):
+        top = top_tracks if args.chart == "tracks" else top_artists
+        rows = top(log, rollups, args.n, args.since, args.until, args.by)
+        for i, (label, plays, hours) in enumerate(rows, start=1):
+            print(f"{i}. {label} ({plays} plays, {hours:.1f} h)")
+        ax = plot_top(rows, f"Top {len(rows)} {args.chart}{window}", args.by)
+    elif args.chart == "days":
+        ax = plot_days(*rollups.per_day(args.since, args.until), args.by)
+        ax.set_title(ax.get_title() + window)
+    else:
+        ax = plot_hours(*rollups.per_hour(args.since, args.until), args.by)
+        ax.set_title(ax.get_title() + window)
+
+    ax.figure.tight_layout()
+    if args.out:
+        ax.figure.savefig(args.out)
+    else:
+        import matplotlib.pyplot as plt
+
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
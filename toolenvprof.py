@@ -7,6 +7,8 @@ import os
 import base64
 from requests import post, get
 import json
+import sys
+from apicache import ApiCache, OfflineMiss, TTL
 
 def get_token(client_id, client_secret):
      headers = {
@@ -20,25 +22,51 @@ def get_token(client_id, client_secret):
 def get_auth_header(token):
      return {'Authorization' : 'Bearer ' + token}
 
-# Search for artist by their name
-def search_for_artist(token, artist_name):
-    url = 'https://api.spotify.com/v1/search'
-    headers = get_auth_header(token)
-    query = f'q={artist_name}&type=artist&limit=1' # ,track
-    
-    query_url = url + '?' + query
-    result = get(query_url, headers=headers)
-    json_result = json.loads(result.content)['artists']['items']
+# Search for artist by their name (answered from cache when it has a fresh copy)
+def search_for_artist(token, artist_name, cache=None):
+    key = ApiCache.key('/search', {'q': artist_name, 'type': 'artist', 'limit': 1})
+    try:
+        response = cache.get(key) if cache else None
+    except OfflineMiss:
+        print(f'Search for {artist_name}: not cached (offline mode)')
+        return None
+    if response is None:
+        url = 'https://api.spotify.com/v1/search'
+        headers = get_auth_header(token)
+        query = f'q={artist_name}&type=artist&limit=1' # ,track
+
+        query_url = url + '?' + query
+        result = get(query_url, headers=headers)
+        if not result.ok:   # errors are not cached, the next run asks again
+            print(f'Search for {artist_name} failed: {result.status_code} {result.text[:200]}')
+            return None
+        response = json.loads(result.content)
+        if cache:
+            cache.put(key, response, TTL['search'])
+    json_result = response['artists']['items']
     if len(json_result) == 0:
         print(f'Artist name {artist_name} not found.')
         return None
     return json_result[0]
 
-def get_songs_by_artist(token, artist_id):
-    url = f'https://api.spotify.com/v1/artists/{artist_id}/top-tracks?country=US'
-    headers = get_auth_header(token)
-    result = get(url, headers=headers)
-    json_result = json.loads(result.content)['tracks']
+def get_songs_by_artist(token, artist_id, cache=None):
+    key = ApiCache.key(f'/artists/{artist_id}/top-tracks', {'country': 'US'})
+    try:
+        response = cache.get(key) if cache else None
+    except OfflineMiss:
+        print(f'Top tracks of {artist_id}: not cached (offline mode)')
+        return None
+    if response is None:
+        url = f'https://api.spotify.com/v1/artists/{artist_id}/top-tracks?country=US'
+        headers = get_auth_header(token)
+        result = get(url, headers=headers)
+        if not result.ok:
+            print(f'Top tracks of {artist_id} failed: {result.status_code} {result.text[:200]}')
+            return None
+        response = json.loads(result.content)
+        if cache:
+            cache.put(key, response, TTL['top-tracks'])
+    json_result = response['tracks']
     return json_result
 
 if __name__ == "__main__":
@@ -47,10 +75,16 @@ if __name__ == "__main__":
     client_id = os.getenv("CLIENT_ID")
     client_secret = os.getenv("CLIENT_SECRET")
     
-    token = get_token(client_id, client_secret)
-    result = search_for_artist(token, input('Enter artist name to search for: '))
+    # Cached responses are reused across runs; --offline answers from the cache only
+    cache = ApiCache(offline='--offline' in sys.argv)
+    token = None if cache.offline else get_token(client_id, client_secret)
+    result = search_for_artist(token, input('Enter artist name to search for: '), cache)
+    if result is None:
+        sys.exit(1)
     artist_id = result['id']
-    songs = get_songs_by_artist(token, artist_id)
+    songs = get_songs_by_artist(token, artist_id, cache)
+    if songs is None:
+        sys.exit(1)
 
     for idx, song in enumerate(songs):
         print(f"#{idx + 1}: {song['name']}")
\ No newline at end of file
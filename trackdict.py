@@ -0,0 +1,67 @@
+# Track dictionary
+# Interns artist names and (artist, track) pairs to dense integer ids once, so plays can be
+# stored and counted as NumPy arrays instead of strings
+
+import numpy as np
+
+
+class TrackDict:
+    """Artist and track names <-> dense integer ids.
+
+    artists[artist_id] is the artist name and tracks[track_id] is an
+    (artist_id, track name) tuple; ids are handed out in first-seen order and
+    never change, so arrays indexed by them stay valid as the dictionary grows.
+    """
+
+    def __init__(self, artists=(), tracks=()):
+        self.artists = list(artists)
+        self.tracks = [tuple(track) for track in tracks]
+        self._artist_ids = {name: i for i, name in enumerate(self.artists)}
+        self._track_ids = {track: i for i, track in enumerate(self.tracks)}
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def intern(self, artist, track):
+        """(artist_id, track_id) for one play, adding the names if they're new."""
+        artist_id = self._artist_ids.get(artist)
+        if artist_id is None:
+            artist_id = self._artist_ids[artist] = len(self.artists)
+            self.artists.append(artist)
+        key = (artist_id, track)
+        track_id = self._track_ids.get(key)
+        if track_id is None:
+            track_id = self._track_ids[key] = len(self.tracks)
+            self.tracks.append(key)
+        return artist_id, track_id
+
+    def intern_many(self, pairs, count=-1, normalize=None):
+        """Track ids (int32 array) for an iterable of raw (artist, track) pairs.
+
+        Each distinct raw pair is normalized (e.g. str.strip) and interned once;
+        repeats are a single dict lookup, and ids go straight into the array
+        without keeping any per-play strings alive.
+        """
+        seen = {}
+
+        def track_id(pair):
+            found = seen.get(pair)
+            if found is None:
+                artist, track = pair if normalize is None else (normalize(pair[0]), normalize(pair[1]))
+                found = seen[pair] = self.intern(artist, track)[1]
+            return found
+
+        return np.fromiter(map(track_id, pairs), dtype=np.int32, count=count)
+
+    def track_artist_ids(self):
+        """Artist id of every track id."""
+        return np.array([a for a, _ in self.tracks], dtype=np.int32)
+
+    def label(self, track_id):
+        """"artist - track" for display."""
+        artist_id, name = self.tracks[track_id]
+        return f"{self.artists[artist_id]} - {name}"
+
+    def counts(self, track_ids, weights=None):
+        """Plays (or summed weights, e.g. ms played) per track id, as an array over every track."""
+        return np.bincount(np.asarray(track_ids), weights=weights, minlength=len(self.tracks))